@@ -0,0 +1,190 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from contextlib import AsyncExitStack
+from typing import Awaitable, Callable
+from uuid import uuid4
+
+import httpx
+
+import database
+from models import settings
+from .fixtures import answer_data, form_data
+
+PASSWORD = "benchmark"
+
+
+class Fixture:
+    def __init__(self) -> None:
+        self.users: list[tuple[str, str]] = []  # username, token
+        self.forms: list[tuple[int, dict, str]] = []  # id, data, owner token
+
+
+async def seed(
+    client: httpx.AsyncClient, users: int, form_sizes: list[int], answers: int
+) -> Fixture:
+    fixture = Fixture()
+    for _ in range(users):
+        username = f"bench-{uuid4().hex[:12]}"
+        response = await client.post(
+            "/admin/user",
+            json={"username": username, "password": PASSWORD},
+            headers={"x-token": settings.ADMIN_PASSWORD},
+        )
+        response.raise_for_status()
+
+        response = await client.post(
+            "/user/login", json={"username": username, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        token = response.json()["token"]
+        fixture.users.append((username, token))
+
+        for size in form_sizes:
+            response = await client.post(
+                "/form/create", json=form_data(size), headers={"x-token": token}
+            )
+            response.raise_for_status()
+            form = response.json()
+            fixture.forms.append((form["id"], form["data"], token))
+
+            for i in range(answers):
+                response = await client.post(
+                    f"/answer/create?form_id={form['id']}",
+                    json=answer_data(form["data"], i),
+                )
+                response.raise_for_status()
+
+    return fixture
+
+
+def scenarios(
+    fixture: Fixture,
+) -> dict[str, Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]]:
+    async def login(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        username, _ = fixture.users[i % len(fixture.users)]
+        return await client.post(
+            "/user/login", json={"username": username, "password": PASSWORD}
+        )
+
+    async def form_get(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        form_id, _, _ = fixture.forms[i % len(fixture.forms)]
+        return await client.get(f"/form/get?id={form_id}")
+
+    async def answer_create(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        form_id, data, _ = fixture.forms[i % len(fixture.forms)]
+        return await client.post(
+            f"/answer/create?form_id={form_id}", json=answer_data(data, i)
+        )
+
+    async def answer_get(client: httpx.AsyncClient, i: int) -> httpx.Response:
+        form_id, _, token = fixture.forms[i % len(fixture.forms)]
+        return await client.get(
+            f"/answer/get?form_id={form_id}", headers={"x-token": token}
+        )
+
+    return {
+        "login": login,
+        "form_get": form_get,
+        "answer_create": answer_create,
+        "answer_get": answer_get,
+    }
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    request: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+    requests: int,
+    concurrency: int,
+) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    order = list(range(requests))
+    random.shuffle(order)
+
+    async def worker() -> None:
+        nonlocal errors
+        while order:
+            i = order.pop()
+            started = time.perf_counter()
+            try:
+                response = await request(client, i)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": requests / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(0.99 * (len(latencies) - 1))] * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with AsyncExitStack() as stack:
+        if args.url:
+            transport = httpx.AsyncHTTPTransport(retries=0)
+            base_url = args.url
+        else:
+            # In process, so that the numbers reflect the application rather
+            # than the network stack or the server's HTTP parsing.
+            import main as server
+
+            app = server.create_app()
+            await stack.enter_async_context(app.router.lifespan_context(app))
+            transport = httpx.ASGITransport(app)
+            base_url = "http://benchmark"
+
+        client = await stack.enter_async_context(
+            httpx.AsyncClient(
+                transport=transport,
+                base_url=base_url,
+                timeout=None,
+                limits=httpx.Limits(max_connections=args.concurrency),
+            )
+        )
+
+        fixture = await seed(client, args.users, args.form_sizes, args.answers)
+        requests = scenarios(fixture)
+
+        results = {
+            "target": args.url or f"in-process ({database.engine.dialect.name})",
+            "concurrency": args.concurrency,
+            "form_sizes": args.form_sizes,
+            "scenarios": {},
+        }
+        for name in args.scenarios or requests:
+            results["scenarios"][name] = await drive(
+                client, requests[name], args.requests, args.concurrency
+            )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Load test the API hot paths against a local database."
+    )
+    parser.add_argument("--url", help="target a running server instead")
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--form-sizes", type=int, nargs="+", default=[5, 50])
+    parser.add_argument("--answers", type=int, default=20, help="seeded per form")
+    parser.add_argument("--requests", type=int, default=1000, help="per scenario")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--scenarios",
+        nargs="*",
+        choices=["login", "form_get", "answer_create", "answer_get"],
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+import argparse
+import json
+import sys
+
+# Throughputs should go up, latencies (_ms, us_per_op) down. Anything else,
+# such as request counts, is not compared.
+HIGHER_IS_BETTER = ("_rps", "_per_sec")
+LOWER_IS_BETTER = ("_ms", "_per_op")
+
+
+def flatten(results: object, prefix: str = "") -> dict[str, float]:
+    values = {}
+    if isinstance(results, dict):
+        items = results.items()
+    elif isinstance(results, list):
+        items = ((str(i), item) for i, item in enumerate(results))
+    else:
+        return values
+
+    for key, value in items:
+        name = f"{prefix}{key}"
+        if isinstance(value, (dict, list)):
+            values |= flatten(value, f"{name}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = float(value)
+    return values
+
+
+def direction(name: str) -> int:
+    metric = name.rpartition(".")[2]
+    if metric.endswith(HIGHER_IS_BETTER):
+        return 1
+    if metric.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def main(args: argparse.Namespace) -> None:
+    with open(args.baseline) as file:
+        baseline = flatten(json.load(file))
+    with open(args.current) as file:
+        current = flatten(json.load(file))
+
+    report = {}
+    regressed = False
+    for name, before in baseline.items():
+        sign = direction(name)
+        after = current.get(name)
+        if sign == 0 or after is None or before == 0:
+            continue
+
+        change = (after - before) / before
+        regression = -sign * change > args.threshold
+        regressed |= regression
+        report[name] = {
+            "baseline": before,
+            "current": after,
+            "change": change,
+            "regression": regression,
+        }
+
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if regressed else 0)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare two benchmark result files and flag regressions."
+    )
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument(
+        "--threshold", type=float, default=0.1, help="relative change, e.g. 0.1"
+    )
+    main(parser.parse_args())
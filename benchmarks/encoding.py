@@ -0,0 +1,112 @@
+import argparse
+import json
+from datetime import datetime, timezone
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse as FastAPIResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from models import AnswerData, Form, FormData, FormSummary
+from utils import JSONResponse
+from .fixtures import answer_data, form_data
+from .micro import measure
+
+
+def run(coroutine: Any) -> Any:
+    # serialize_response only awaits anything for sync endpoints, so it can be
+    # driven without an event loop getting into the measurements.
+    try:
+        coroutine.send(None)
+    except StopIteration as e:
+        return e.value
+    raise RuntimeError("serialize_response suspended")
+
+
+def fastapi_encoder(content: Any, response_model: Any = None) -> Callable[[], bytes]:
+    # What FastAPI does with a returned value: validate it against the
+    # response model if there is one, convert it to JSON-compatible Python
+    # objects and render those with json.dumps.
+    field = None
+    if response_model is not None:
+        field = create_response_field(
+            name="response", type_=response_model, mode="serialization"
+        )
+
+    def encode() -> bytes:
+        return FastAPIResponse(
+            run(serialize_response(field=field, response_content=content))
+        ).body
+
+    return encode
+
+
+def payloads(rows: int, size: int) -> dict[str, tuple[Any, Any]]:
+    raw_form = form_data(size)
+    form = Form(id=1, data=FormData.model_validate(raw_form))
+    updated_at = datetime.now(timezone.utc)
+
+    return {
+        # /answer/get: stored answer data as plain dicts.
+        f"answers_{rows}": (
+            {
+                "answers": [
+                    {"id": i, "data": answer_data(raw_form, i)} for i in range(rows)
+                ],
+                "next": None,
+            },
+            None,
+        ),
+        # /answer/create: a validated answer model.
+        f"answer_model_{size}": (
+            {"id": 1, "data": AnswerData.model_validate(answer_data(raw_form))},
+            None,
+        ),
+        # /form/list: a page of summaries.
+        f"form_summaries_{rows}": (
+            {
+                "forms": [
+                    FormSummary(
+                        id=i, name=f"Form {i}", answers=i, updated_at=updated_at
+                    )
+                    for i in range(rows)
+                ],
+                "next": None,
+            },
+            None,
+        ),
+        # /form/create and /form/edit: a form with a response model.
+        f"form_{size}": (form, Form),
+    }
+
+
+def main(args: argparse.Namespace) -> None:
+    results = {}
+    for name, (content, response_model) in payloads(args.rows, args.size).items():
+        before = fastapi_encoder(content, response_model)
+        after = lambda content=content: JSONResponse(content).body
+
+        if json.loads(before()) != json.loads(after()):
+            raise SystemExit(f"{name}: encodings differ")
+
+        results[name] = {
+            "bytes": len(after()),
+            "fastapi": measure(before, args.min_time),
+            "pydantic_core": measure(after, args.min_time),
+        }
+        results[name]["speedup"] = (
+            results[name]["fastapi"]["us_per_op"]
+            / results[name]["pydantic_core"]["us_per_op"]
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare FastAPI's default response encoding with JSONResponse."
+    )
+    parser.add_argument("--rows", type=int, default=1000, help="items per list")
+    parser.add_argument("--size", type=int, default=50, help="questions per form")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds")
+    main(parser.parse_args())
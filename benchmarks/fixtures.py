@@ -0,0 +1,51 @@
+from uuid import uuid4
+
+from models import QuestionType
+
+
+def form_data(size: int) -> dict:
+    questions = []
+    for i in range(size):
+        question_type = (QuestionType.text, QuestionType.selector, QuestionType.scale)[
+            i % 3
+        ]
+        question = {
+            "id": str(uuid4()),
+            "question_type": question_type,
+            "label": f"Question {i}",
+        }
+        if question_type == QuestionType.text:
+            question.update(min_length=1, max_length=200)
+        elif question_type == QuestionType.selector:
+            question.update(
+                options=[{"label": f"Option {j}"} for j in range(5)], max_values=2
+            )
+        else:
+            question.update(min_value=1, max_value=5)
+        questions.append(question)
+
+    # Ten questions to a page, like a long questionnaire would be laid out.
+    return {
+        "name": f"Form with {size} questions",
+        "pages": [
+            {"questions": questions[i : i + 10]} for i in range(0, len(questions), 10)
+        ],
+    }
+
+
+def answer_data(form: dict, seed: int = 0) -> dict:
+    values = []
+    for page in form["pages"]:
+        for question in page["questions"]:
+            value = {
+                "question_id": question["id"],
+                "question_type": question["question_type"],
+            }
+            if question["question_type"] == QuestionType.text:
+                value["value"] = "answer " * (1 + seed % 5)
+            elif question["question_type"] == QuestionType.selector:
+                value["values"] = sorted({seed % 5, (seed + 1) % 5})
+            else:
+                value["value"] = 1 + seed % 5
+            values.append(value)
+    return {"values": values}
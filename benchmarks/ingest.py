@@ -0,0 +1,128 @@
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from uuid import uuid4
+
+import database
+from database import migrations
+from database.form import add_version
+from database.writer import AnswerWriter
+from models import settings
+
+# SQLite allows one writer at a time; with more than a handful of concurrent
+# write transactions, some fail with "database is locked".
+CONCURRENCY = {"sqlite": 10}
+
+
+async def seed_form() -> tuple[int, int, dict]:
+    await migrations.migrate()
+
+    question_id = str(uuid4())
+    async with database.sessions.begin() as session:
+        user = database.User(username=f"bench-{uuid4()}", password="", salt="")
+        session.add(user)
+        await session.flush()
+
+        form = database.Form(
+            name="bench",
+            owner_id=user.id,
+            data={
+                "name": "bench",
+                "pages": [
+                    {
+                        "questions": [
+                            {"id": question_id, "question_type": 1, "label": "q"}
+                        ]
+                    }
+                ],
+            },
+        )
+        session.add(form)
+        await session.flush()
+        version = await add_version(session, form, form.data)
+        form_id, version_id = form.id, version.id
+
+    answer = {
+        "values": [{"question_id": question_id, "question_type": 1, "value": "a"}]
+    }
+    return form_id, version_id, answer
+
+
+async def measure(
+    writer: AnswerWriter,
+    form_id: int,
+    version_id: int,
+    answer: dict,
+    rows: int,
+    concurrency: int,
+) -> dict:
+    # A failed write is counted rather than aborting the run, so that both
+    # paths are compared even when one of them runs into lock timeouts.
+    written = 0
+    errors: Counter[str] = Counter()
+
+    async def submit(count: int) -> None:
+        nonlocal written
+        for _ in range(count):
+            try:
+                await writer.write(form_id, version_id, answer)
+            except Exception as e:
+                errors[type(e).__name__] += 1
+            else:
+                written += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(submit(rows // concurrency) for _ in range(concurrency)))
+    return {
+        "rows_per_sec": written / (time.perf_counter() - started),
+        "written": written,
+        "failed": sum(errors.values()),
+        "errors": errors,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    if args.concurrency is None:
+        args.concurrency = CONCURRENCY.get(database.engine.dialect.name, 200)
+    form_id, version_id, answer = await seed_form()
+
+    direct = AnswerWriter(args.batch_size, args.interval / 1000)
+    batched = AnswerWriter(args.batch_size, args.interval / 1000)
+    batched.start()
+
+    results = {
+        "database": database.engine.dialect.name,
+        "rows": args.rows,
+        "concurrency": args.concurrency,
+        "batch_size": args.batch_size,
+        "interval_ms": args.interval,
+        "per_request": await measure(
+            direct, form_id, version_id, answer, args.rows, args.concurrency
+        ),
+        "batched": await measure(
+            batched, form_id, version_id, answer, args.rows, args.concurrency
+        ),
+    }
+    await batched.stop()
+    await database.engine.dispose()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compare per-request answer inserts with batched ingestion."
+    )
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        help="concurrent writers, 200 by default and 10 on SQLite",
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.ANSWER_BATCH_SIZE)
+    parser.add_argument(
+        "--interval", type=int, default=settings.ANSWER_BATCH_INTERVAL, help="ms"
+    )
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,68 @@
+import argparse
+import json
+import timeit
+from typing import Callable
+
+from models import Answer, AnswerData, CompiledForm, Form, FormData
+from utils import validate_snils, validate_tin
+from .fixtures import answer_data, form_data
+
+
+def measure(function: Callable[[], object], min_time: float) -> dict:
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(number, int(number * min_time / 0.2))
+    best = min(timer.repeat(repeat=5, number=number)) / number
+    return {"ops_per_sec": 1 / best, "us_per_op": best * 1e6}
+
+
+def cases(sizes: list[int]) -> dict[str, Callable[[], object]]:
+    benchmarks: dict[str, Callable[[], object]] = {
+        "validate_tin_10": lambda: validate_tin("7707083893"),
+        "validate_tin_12": lambda: validate_tin("500100732259"),
+        "validate_snils": lambda: validate_snils("11223344595"),
+    }
+
+    for size in sizes:
+        raw_form = form_data(size)
+        raw_answer = answer_data(raw_form)
+        form = Form(id=1, data=FormData.model_validate(raw_form))
+        compiled = CompiledForm(form.data)
+        parsed_answer = AnswerData.model_validate(raw_answer)
+
+        benchmarks |= {
+            f"form_data_parse_{size}": lambda raw=raw_form: FormData.model_validate(
+                raw
+            ),
+            f"answer_data_parse_{size}": lambda raw=raw_answer: (
+                AnswerData.model_validate(raw)
+            ),
+            f"answer_validator_{size}": lambda form=form, raw=raw_answer: (
+                Answer.model_validate({"id": 1, "form": form, "data": raw})
+            ),
+            f"compiled_form_validate_{size}": lambda c=compiled, a=parsed_answer: (
+                c.validate(a)
+            ),
+        }
+
+    return benchmarks
+
+
+def main(args: argparse.Namespace) -> None:
+    results = {}
+    for name, function in cases(args.form_sizes).items():
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        results[name] = measure(function, args.min_time)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Microbenchmarks for validation and parsing hot paths."
+    )
+    parser.add_argument("--form-sizes", type=int, nargs="+", default=[5, 50, 200])
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds")
+    parser.add_argument("--only", nargs="*", help="substrings of case names")
+    main(parser.parse_args())
@@ -0,0 +1,82 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import statistics
+import time
+
+from utils import HASHERS, Passwords
+
+
+async def monitor_lag(stop: asyncio.Event, interval: float = 0.005) -> list[float]:
+    loop = asyncio.get_running_loop()
+    lags = []
+    while not stop.is_set():
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lags.append(loop.time() - started - interval)
+    return lags
+
+
+async def measure(
+    passwords: Passwords, hashed: str, logins: int, concurrency: int
+) -> dict:
+    async def login(count: int) -> None:
+        for _ in range(count):
+            assert await passwords.verify("password", "salt", hashed)
+
+    stop = asyncio.Event()
+    monitor = asyncio.create_task(monitor_lag(stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(login(logins // concurrency) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    lags = sorted(await monitor)
+    return {
+        "logins_per_sec": logins // concurrency * concurrency / elapsed,
+        "loop_lag_p50_ms": statistics.median(lags) * 1000,
+        "loop_lag_p99_ms": lags[int(0.99 * (len(lags) - 1))] * 1000,
+        "loop_lag_max_ms": lags[-1] * 1000,
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    results = []
+
+    passwords = Passwords(HASHERS[args.scheme](), args.workers)
+    legacy = hashlib.sha512(b"passwordsalt").hexdigest()
+    results.append(
+        {
+            "scheme": "sha512",
+            "cost": 1,
+            **await measure(passwords, legacy, args.logins, args.concurrency),
+        }
+    )
+
+    for cost in args.costs or [HASHERS[args.scheme].default_cost]:
+        passwords = Passwords(HASHERS[args.scheme](cost), args.workers)
+        hashed = await passwords.hash("password", "salt")
+        results.append(
+            {
+                "scheme": args.scheme,
+                "cost": cost,
+                **await measure(passwords, hashed, args.logins, args.concurrency),
+            }
+        )
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Measure login throughput and event loop lag per hash cost."
+    )
+    parser.add_argument("--scheme", choices=HASHERS, default="scrypt")
+    parser.add_argument("--costs", type=int, nargs="*")
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
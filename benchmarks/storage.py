@@ -0,0 +1,187 @@
+import argparse
+import asyncio
+import json
+import sys
+import time
+from uuid import uuid4
+
+from sqlalchemy import select, text
+
+import database
+from database import migrations
+from database.form import add_version
+from routes import stats
+
+# Answers are generated server-side: a text question, a selector with four
+# options of which one or two are picked, and a 1-5 scale.
+SEED_ANSWERS = text(
+    """
+    INSERT INTO answers (form_id, version_id, data)
+    SELECT :form_id, (SELECT version_id FROM forms WHERE id = :form_id),
+    jsonb_build_object('values', jsonb_build_array(
+        jsonb_build_object(
+            'question_id', :text_id, 'question_type', 1,
+            'value', repeat('x', 1 + i % 40)
+        ),
+        jsonb_build_object(
+            'question_id', :selector_id, 'question_type', 2,
+            'values', CASE WHEN i % 3 = 0
+                THEN jsonb_build_array(i % 4, (i + 1) % 4)
+                ELSE jsonb_build_array(i % 4) END
+        ),
+        jsonb_build_object(
+            'question_id', :scale_id, 'question_type', 3, 'value', 1 + i % 5
+        )
+    ))
+    FROM generate_series(1, :rows) AS i
+    """
+)
+
+
+async def seed(rows: int, forms: int) -> tuple[int, dict[str, str]]:
+    await migrations.migrate()
+
+    ids = {"text_id": str(uuid4()), "selector_id": str(uuid4())}
+    ids["scale_id"] = str(uuid4())
+    form_data = {
+        "name": "bench",
+        "pages": [
+            {
+                "questions": [
+                    {"id": ids["text_id"], "question_type": 1, "label": "t"},
+                    {
+                        "id": ids["selector_id"],
+                        "question_type": 2,
+                        "label": "s",
+                        "options": ["a", "b", "c", "d"],
+                        "max_values": 2,
+                    },
+                    {
+                        "id": ids["scale_id"],
+                        "question_type": 3,
+                        "label": "r",
+                        "min_value": 1,
+                        "max_value": 5,
+                    },
+                ]
+            }
+        ],
+    }
+
+    async with database.sessions.begin() as session:
+        user = database.User(username=f"bench-{uuid4()}", password="", salt="")
+        session.add(user)
+        await session.flush()
+
+        # The measured form shares the table with others of the same size so
+        # that lookups have to go through the form_id index.
+        form_ids = []
+        for _ in range(forms):
+            form = database.Form(name="bench", owner_id=user.id, data=form_data)
+            session.add(form)
+            await session.flush()
+            await add_version(session, form, form_data)
+            form_ids.append(form.id)
+
+        for form_id in form_ids:
+            await session.execute(
+                SEED_ANSWERS, {"form_id": form_id, "rows": rows // forms, **ids}
+            )
+
+    async with database.engine.connect() as connection:
+        await connection.execute(text("ANALYZE answers"))
+
+    return form_ids[-1], ids
+
+
+async def timed(repeat: int, query) -> dict:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await query()
+        samples.append((time.perf_counter() - started) * 1000)
+
+    samples.sort()
+    return {
+        "p50_ms": samples[len(samples) // 2],
+        "max_ms": samples[-1],
+    }
+
+
+async def main(args: argparse.Namespace) -> None:
+    if database.engine.dialect.name != "postgresql":
+        sys.exit("This benchmark requires a PostgreSQL database")
+
+    form_id, ids = await seed(args.rows, args.forms)
+    Answer = database.Answer
+
+    async def page() -> None:
+        async with database.sessions() as session:
+            last = await session.scalar(
+                select(Answer.id)
+                .where(Answer.form_id == form_id)
+                .order_by(Answer.id.desc())
+                .limit(1)
+            )
+            stmt = (
+                select(Answer.id, Answer.data)
+                .where(Answer.form_id == form_id, Answer.id > last - 1000)
+                .order_by(Answer.id)
+                .limit(100)
+            )
+            (await session.execute(stmt)).all()
+
+    def contains(match: dict):
+        async def query() -> None:
+            stmt = (
+                select(Answer.id)
+                .where(
+                    Answer.form_id == form_id,
+                    Answer.data.contains({"values": [match]}),
+                )
+                .order_by(Answer.id)
+                .limit(100)
+            )
+            async with database.sessions() as session:
+                (await session.execute(stmt)).all()
+
+        return query
+
+    async def count() -> None:
+        async with database.sessions() as session:
+            await stats.count_answers(session, form_id)
+
+    results = {
+        "rows": args.rows,
+        "forms": args.forms,
+        "keyset_page": await timed(args.repeat, page),
+        "filter_selector_option": await timed(
+            args.repeat,
+            contains({"question_id": ids["selector_id"], "values": [2]}),
+        ),
+        "filter_scale_value": await timed(
+            args.repeat, contains({"question_id": ids["scale_id"], "value": 5})
+        ),
+        "stats_scan": await timed(max(1, args.repeat // 10), count),
+    }
+
+    match = {"values": [{"question_id": ids["selector_id"], "values": [2]}]}
+    async with database.engine.connect() as connection:
+        plan = await connection.execute(
+            text("EXPLAIN SELECT id FROM answers WHERE data @> CAST(:match AS jsonb)"),
+            {"match": json.dumps(match)},
+        )
+        results["filter_plan"] = [row[0] for row in plan]
+
+    await database.engine.dispose()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Time answer paging, filtering and stats on a synthetic dataset."
+    )
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--forms", type=int, default=4)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -1,15 +1,66 @@
 from models import settings
+from sqlalchemy import JSON, make_url
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import DeclarativeBase
 
-engine = create_async_engine(settings.DATABASE)
+from .metrics import TimedQueuePool, instrument
+
+
+def engine_options(dsn: str) -> dict:
+    url = make_url(dsn)
+    options: dict = {
+        "pool_pre_ping": settings.DATABASE_POOL_PRE_PING,
+        "pool_recycle": settings.DATABASE_POOL_RECYCLE,
+    }
+    # In-memory SQLite keeps its single static connection.
+    if url.get_backend_name() != "sqlite" or url.database not in (None, "", ":memory:"):
+        options.update(
+            poolclass=TimedQueuePool,
+            pool_size=settings.DATABASE_POOL_SIZE,
+            max_overflow=settings.DATABASE_MAX_OVERFLOW,
+            pool_timeout=settings.DATABASE_POOL_TIMEOUT,
+        )
+    if url.get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": settings.DATABASE_STATEMENT_CACHE_SIZE
+        }
+    return options
+
+
+engine = create_async_engine(settings.DATABASE, **engine_options(settings.DATABASE))
+instrument(engine.sync_engine)
 sessions = async_sessionmaker(engine)
 
+if settings.DATABASE_REPLICA:
+    replica_engine = create_async_engine(
+        settings.DATABASE_REPLICA, **engine_options(settings.DATABASE_REPLICA)
+    )
+    instrument(replica_engine.sync_engine)
+    read_sessions = async_sessionmaker(replica_engine)
+else:
+    replica_engine = engine
+    read_sessions = sessions
+
+JSONData = JSON().with_variant(JSONB(), "postgresql")
+
 
 class Base(DeclarativeBase):
     pass
 
 
 from .user import User
-from .form import Form
+from .form import Form, FormVersion
 from .answer import Answer
+from .counter import ResultCounter
+from .writer import AnswerWriter
+from .reaper import Reaper
+
+answer_writer = AnswerWriter(
+    settings.ANSWER_BATCH_SIZE, settings.ANSWER_BATCH_INTERVAL / 1000
+)
+reaper = Reaper(
+    settings.REAPER_INTERVAL,
+    settings.REAPER_BATCH_SIZE,
+    settings.REAPER_BATCH_PAUSE / 1000,
+)
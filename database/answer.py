@@ -1,14 +1,27 @@
-from sqlalchemy import JSON, ForeignKey
+from sqlalchemy import ForeignKey, Index
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from database import Base, Form
+from database import Base, Form, FormVersion, JSONData
 
 
 class Answer(Base):
     __tablename__ = "answers"
+    __table_args__ = (
+        Index("ix_answers_form_id", "form_id", "id"),
+        Index("ix_answers_version_id", "version_id", "id"),
+        Index(
+            "ix_answers_data",
+            "data",
+            postgresql_using="gin",
+            postgresql_ops={"data": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     form_id: Mapped[int] = mapped_column(ForeignKey(Form.id, ondelete="CASCADE"))
-    data: Mapped[dict] = mapped_column(JSON)
+    version_id: Mapped[int | None] = mapped_column(
+        ForeignKey(FormVersion.id, ondelete="CASCADE")
+    )
+    data: Mapped[dict] = mapped_column(JSONData)
 
     form: Mapped[Form] = relationship(Form, lazy="joined")
@@ -0,0 +1,90 @@
+from collections import Counter
+from typing import Iterator
+
+from sqlalchemy import ForeignKey, delete, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Mapped, mapped_column
+
+from database import Base, Form
+from models import QuestionType
+
+# Counters are keyed by question id and bucket: a text length, a scale value or
+# a selected option. ANSWERED counts the responses to a question, and the
+# RESPONSES question id holds the number of responses to the whole form.
+ANSWERED = -1
+RESPONSES = ""
+
+Key = tuple[str, int]
+
+
+class ResultCounter(Base):
+    __tablename__ = "result_counters"
+
+    form_id: Mapped[int] = mapped_column(
+        ForeignKey(Form.id, ondelete="CASCADE"), primary_key=True
+    )
+    question_id: Mapped[str] = mapped_column(primary_key=True)
+    key: Mapped[int] = mapped_column(primary_key=True)
+    count: Mapped[int]
+
+
+def answer_keys(data: dict) -> Iterator[Key]:
+    yield RESPONSES, ANSWERED
+
+    for value in data["values"]:
+        question_id = value["question_id"]
+        yield question_id, ANSWERED
+
+        question_type = value["question_type"]
+        if question_type == QuestionType.text:
+            yield question_id, len(value["value"])
+        elif question_type == QuestionType.scale:
+            yield question_id, value["value"]
+        elif question_type == QuestionType.selector:
+            for option in value["values"]:
+                if option >= 0:
+                    yield question_id, option
+
+
+async def update_counters(
+    session: AsyncSession, form_id: int, counts: dict[Key, int]
+) -> None:
+    if session.bind.dialect.name == "postgresql":
+        insert = postgresql.insert
+    else:
+        insert = sqlite.insert
+
+    # Rows are always touched in the same order so that concurrent writers
+    # to one form queue up on the row locks instead of deadlocking.
+    rows = [
+        {"form_id": form_id, "question_id": question_id, "key": key, "count": count}
+        for (question_id, key), count in sorted(counts.items())
+        if count != 0
+    ]
+    for i in range(0, len(rows), 1000):
+        stmt = insert(ResultCounter).values(rows[i : i + 1000])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[
+                ResultCounter.form_id,
+                ResultCounter.question_id,
+                ResultCounter.key,
+            ],
+            set_={"count": ResultCounter.count + stmt.excluded.count},
+        )
+        await session.execute(stmt)
+
+
+async def read_counters(session: AsyncSession, form_id: int) -> Counter[Key]:
+    stmt = select(
+        ResultCounter.question_id, ResultCounter.key, ResultCounter.count
+    ).where(ResultCounter.form_id == form_id, ResultCounter.count != 0)
+    db_request = await session.execute(stmt)
+    return Counter(
+        {(question_id, key): count for question_id, key, count in db_request}
+    )
+
+
+async def reset_counters(session: AsyncSession, form_id: int) -> None:
+    stmt = delete(ResultCounter).where(ResultCounter.form_id == form_id)
+    await session.execute(stmt)
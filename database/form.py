@@ -1,13 +1,56 @@
-from sqlalchemy import JSON, ForeignKey
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Index, func, text
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
-from database import Base, User
+from database import Base, User, JSONData
 
 
 class Form(Base):
     __tablename__ = "forms"
+    __table_args__ = (
+        Index(
+            "ix_forms_deleted_at",
+            "deleted_at",
+            postgresql_where=text("deleted_at IS NOT NULL"),
+            sqlite_where=text("deleted_at IS NOT NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     name: Mapped[str]
-    owner_id: Mapped[int] = mapped_column(ForeignKey(User.id, ondelete="CASCADE"))
-    data: Mapped[dict] = mapped_column(JSON)
+    owner_id: Mapped[int] = mapped_column(
+        ForeignKey(User.id, ondelete="CASCADE"), index=True
+    )
+    # The current row in form_versions, with its data copied to the form. Not
+    # a foreign key, as versions reference their form in turn.
+    version_id: Mapped[int | None]
+    data: Mapped[dict] = mapped_column(JSONData)
+    # Unknown for forms last edited before it was tracked.
+    updated_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # Set when the form is deleted. Deleted forms are hidden right away and
+    # removed with their answers by the reaper.
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+
+
+class FormVersion(Base):
+    __tablename__ = "form_versions"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    form_id: Mapped[int] = mapped_column(
+        ForeignKey(Form.id, ondelete="CASCADE"), index=True
+    )
+    data: Mapped[dict] = mapped_column(JSONData)
+
+
+async def add_version(session: AsyncSession, form: Form, data: dict) -> FormVersion:
+    version = FormVersion(form_id=form.id, data=data)
+    session.add(version)
+    await session.flush()
+
+    form.data = data
+    form.version_id = version.id
+    form.updated_at = func.now()
+    await session.flush()
+    return version
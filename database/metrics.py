@@ -0,0 +1,79 @@
+import time
+from functools import partial
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from utils.metrics import Timing, current_request
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    waiting = 0
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait = Timing()
+
+    # Disposing of the engine replaces its pool; the figures carry over.
+    def recreate(self):
+        pool = super().recreate()
+        pool.wait = self.wait
+        return pool
+
+    # Covers both waiting for a connection to be returned and opening a new
+    # one while the pool is below its limit.
+    def _do_get(self):
+        self.waiting += 1
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.waiting -= 1
+            elapsed = time.perf_counter() - started
+            self.wait.add(elapsed)
+            stats = current_request.get()
+            if stats is not None:
+                stats.pool_wait += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    context._started = time.perf_counter()
+
+
+def _after_cursor_execute(queries, conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - context._started
+    queries.add(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_time += elapsed
+        stats.queries += 1
+
+
+# Query times are kept per engine, so that the primary's and the replica's
+# are reported apart.
+query_times: dict[Engine, Timing] = {}
+
+
+def instrument(engine: Engine) -> None:
+    queries = query_times.setdefault(engine, Timing())
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(
+        engine, "after_cursor_execute", partial(_after_cursor_execute, queries)
+    )
+
+
+def pool_status(engine: Engine) -> dict:
+    pool = engine.pool
+    status = {
+        "queries": query_times.get(engine, Timing()).snapshot(),
+        "wait": getattr(pool, "wait", Timing()).snapshot(),
+    }
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            overflow=max(pool.overflow(), 0),
+            waiting=getattr(pool, "waiting", 0),
+        )
+    return status
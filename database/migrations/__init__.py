@@ -0,0 +1,20 @@
+from .runner import Migration, MigrationContext, applied_version, run
+from . import (
+    v001_initial,
+    v002_jsonb_storage,
+    v003_form_versions,
+    v004_soft_delete,
+    v005_form_updated_at,
+)
+
+MIGRATIONS = [
+    Migration(v001_initial),
+    Migration(v002_jsonb_storage),
+    Migration(v003_form_versions),
+    Migration(v004_soft_delete),
+    Migration(v005_form_updated_at),
+]
+
+
+async def migrate() -> None:
+    await run(MIGRATIONS)
@@ -0,0 +1,194 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from types import ModuleType
+from typing import Any, AsyncContextManager
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    func,
+    inspect,
+    select,
+    text,
+)
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+import database
+from models import settings
+
+# Kept out of Base.metadata so that create_all never touches it.
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+# Arbitrary key for pg_advisory_lock, so that concurrently booting instances
+# do not run the same migration twice.
+LOCK_KEY = 0x666F726D
+
+
+class Migration:
+    def __init__(self, module: ModuleType) -> None:
+        self.version: int = module.VERSION
+        self.name = module.__name__.rpartition(".")[2]
+        self.upgrade = module.upgrade
+
+
+class MigrationContext:
+    def __init__(self, connection: AsyncConnection) -> None:
+        self.connection = connection
+        self.dialect = connection.dialect.name
+        self.batch_size = settings.MIGRATION_BATCH_SIZE
+        self.pause = settings.MIGRATION_BATCH_PAUSE / 1000
+
+    def transaction(self) -> AsyncContextManager[AsyncConnection]:
+        return database.engine.begin()
+
+    async def execute(self, statement: str, parameters: dict[str, Any] = {}) -> Any:
+        return await self.connection.execute(text(statement), parameters)
+
+    async def scalar(self, statement: str, parameters: dict[str, Any] = {}) -> Any:
+        return await self.connection.scalar(text(statement), parameters)
+
+    async def add_column(self, table: str, column: str, definition: str) -> None:
+        columns = await self.connection.run_sync(
+            lambda sync: inspect(sync).get_columns(table)
+        )
+        if column not in {item["name"] for item in columns}:
+            await self.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+    async def backfill(self, table: str, assignment: str, condition: str) -> int:
+        # Updates rows matching the condition in id order, one short
+        # transaction per chunk, sleeping between chunks to leave room for
+        # regular traffic. Returns the last id it has seen.
+        statement = text(
+            f"""
+            UPDATE {table} SET {assignment}
+            WHERE id IN (
+                SELECT id FROM {table}
+                WHERE id > :after AND ({condition})
+                ORDER BY id
+                LIMIT :limit
+            )
+            RETURNING id
+            """
+        )
+
+        after, total = 0, 0
+        while True:
+            result = await self.connection.execute(
+                statement, {"after": after, "limit": self.batch_size}
+            )
+            ids = list(result.scalars())
+            if not ids:
+                return after
+
+            after = max(ids)
+            total += len(ids)
+            logging.info("Backfilled %d rows of %s (up to id %d)", total, table, after)
+            await asyncio.sleep(self.pause)
+
+    async def create_index(self, name: str, table: str, definition: str) -> None:
+        if self.dialect != "postgresql":
+            await self.execute(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}"
+            )
+            return
+
+        # An interrupted CREATE INDEX CONCURRENTLY leaves an invalid index
+        # behind, which IF NOT EXISTS would otherwise keep forever.
+        valid = await self.scalar(
+            "SELECT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)",
+            {"name": name},
+        )
+        if valid is False:
+            await self.execute(f"DROP INDEX CONCURRENTLY {name}")
+        await self.execute(
+            f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} {definition}"
+        )
+
+
+async def applied_version(connection: AsyncConnection) -> int | None:
+    try:
+        return await connection.scalar(
+            select(func.coalesce(func.max(schema_migrations.c.version), 0))
+        )
+    except DBAPIError:
+        return None
+
+
+async def stamp(connection: AsyncConnection, migration: Migration) -> None:
+    await connection.execute(
+        schema_migrations.insert().values(
+            version=migration.version,
+            name=migration.name,
+            applied_at=datetime.now(timezone.utc),
+        )
+    )
+
+
+async def run(migrations: list[Migration]) -> None:
+    latest = migrations[-1].version
+
+    # Migrations run outside of a transaction: CREATE INDEX CONCURRENTLY
+    # requires it, and each backfill chunk commits on its own. Every step
+    # has to be safe to repeat after an interruption.
+    async with database.engine.connect() as connection:
+        connection = await connection.execution_options(isolation_level="AUTOCOMMIT")
+
+        # Fast path for an up-to-date schema: a single query, no reflection.
+        if await applied_version(connection) == latest:
+            return
+
+        postgresql = connection.dialect.name == "postgresql"
+        if postgresql:
+            await connection.execute(
+                text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY}
+            )
+
+        try:
+            await upgrade(connection, migrations)
+        finally:
+            if postgresql:
+                await connection.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY}
+                )
+
+
+async def upgrade(connection: AsyncConnection, migrations: list[Migration]) -> None:
+    version = await applied_version(connection)
+    if version is None:
+        initialized = await connection.run_sync(
+            lambda sync: inspect(sync).has_table(database.User.__tablename__)
+        )
+        await connection.run_sync(schema_migrations.create, checkfirst=True)
+
+        if not initialized:
+            logging.info("Creating tables in database")
+            await connection.run_sync(database.Base.metadata.create_all)
+            for migration in migrations:
+                await stamp(connection, migration)
+            return
+
+        # Deployments from before migrations existed were created by
+        # create_all, which is what the first migration does.
+        logging.info("Found an unversioned schema, upgrading from the baseline")
+        version = 0
+
+    context = MigrationContext(connection)
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+
+        logging.info("Applying migration %s", migration.name)
+        await migration.upgrade(context)
+        await stamp(connection, migration)
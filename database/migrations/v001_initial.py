@@ -0,0 +1,52 @@
+from sqlalchemy import Column, ForeignKey, Integer, JSON, MetaData, String, Table
+
+from .runner import MigrationContext
+
+VERSION = 1
+
+# The schema as create_all used to build it. Later migrations must not change
+# these tables, so that an empty database and an old deployment end up alike.
+metadata = MetaData()
+
+Table(
+    "users",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("username", String, nullable=False, unique=True),
+    Column("password", String, nullable=False),
+    Column("salt", String, nullable=False),
+)
+
+Table(
+    "forms",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("owner_id", ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("data", JSON, nullable=False),
+)
+
+Table(
+    "answers",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column("form_id", ForeignKey("forms.id", ondelete="CASCADE"), nullable=False),
+    Column("data", JSON, nullable=False),
+)
+
+Table(
+    "result_counters",
+    metadata,
+    Column(
+        "form_id",
+        ForeignKey("forms.id", ondelete="CASCADE"),
+        primary_key=True,
+    ),
+    Column("question_id", String, primary_key=True),
+    Column("key", Integer, primary_key=True),
+    Column("count", Integer, nullable=False),
+)
+
+
+async def upgrade(context: MigrationContext) -> None:
+    await context.connection.run_sync(metadata.create_all)
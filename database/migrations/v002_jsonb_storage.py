@@ -0,0 +1,81 @@
+from .runner import MigrationContext
+
+VERSION = 2
+
+# While the old rows are backfilled, a trigger keeps the new column in sync
+# for everything written meanwhile, so the final swap never has to scan.
+SYNC_FUNCTION = """
+CREATE OR REPLACE FUNCTION formaptix_sync_data_jsonb() RETURNS trigger AS $$
+BEGIN
+    NEW.data_jsonb := NEW.data::jsonb;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+async def convert_to_jsonb(context: MigrationContext, table: str) -> None:
+    data_type = await context.scalar(
+        """
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema()
+            AND table_name = :table AND column_name = 'data'
+        """,
+        {"table": table},
+    )
+    if data_type != "jsonb":
+        await context.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS data_jsonb jsonb"
+        )
+        await context.execute(SYNC_FUNCTION)
+        await context.execute(f"DROP TRIGGER IF EXISTS {table}_data_jsonb ON {table}")
+        await context.execute(
+            f"""
+            CREATE TRIGGER {table}_data_jsonb BEFORE INSERT OR UPDATE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION formaptix_sync_data_jsonb()
+            """
+        )
+        await context.backfill(table, "data_jsonb = data::jsonb", "data_jsonb IS NULL")
+
+        # The swap only touches the catalog, so the exclusive lock is brief,
+        # and waiting for it gives up instead of stalling all traffic.
+        async with context.transaction() as connection:
+            for statement in [
+                "SET LOCAL lock_timeout = '5s'",
+                f"DROP TRIGGER {table}_data_jsonb ON {table}",
+                f"ALTER TABLE {table} DROP COLUMN data",
+                f"ALTER TABLE {table} RENAME COLUMN data_jsonb TO data",
+                f"""
+                ALTER TABLE {table} ADD CONSTRAINT {table}_data_not_null
+                CHECK (data IS NOT NULL) NOT VALID
+                """,
+            ]:
+                await connection.exec_driver_sql(statement)
+
+    # Validating the constraint does not block writes, and lets SET NOT NULL
+    # skip its own full scan.
+    constraint = await context.scalar(
+        "SELECT 1 FROM pg_constraint WHERE conname = :name",
+        {"name": f"{table}_data_not_null"},
+    )
+    if constraint:
+        await context.execute(
+            f"ALTER TABLE {table} VALIDATE CONSTRAINT {table}_data_not_null"
+        )
+        await context.execute(f"ALTER TABLE {table} ALTER COLUMN data SET NOT NULL")
+        await context.execute(
+            f"ALTER TABLE {table} DROP CONSTRAINT {table}_data_not_null"
+        )
+
+
+async def upgrade(context: MigrationContext) -> None:
+    if context.dialect == "postgresql":
+        await convert_to_jsonb(context, "forms")
+        await convert_to_jsonb(context, "answers")
+
+    await context.create_index("ix_forms_owner_id", "forms", "(owner_id)")
+    await context.create_index("ix_answers_form_id", "answers", "(form_id, id)")
+    if context.dialect == "postgresql":
+        await context.create_index(
+            "ix_answers_data", "answers", "USING gin (data jsonb_path_ops)"
+        )
@@ -0,0 +1,82 @@
+from sqlalchemy import JSON, Column, ForeignKey, Integer, MetaData, Table
+from sqlalchemy.dialects.postgresql import JSONB
+
+from .runner import MigrationContext
+
+VERSION = 3
+
+metadata = MetaData()
+
+# Only there for the foreign key to resolve; the table already exists.
+Table("forms", metadata, Column("id", Integer, primary_key=True))
+
+form_versions = Table(
+    "form_versions",
+    metadata,
+    Column("id", Integer, primary_key=True),
+    Column(
+        "form_id",
+        ForeignKey("forms.id", ondelete="CASCADE"),
+        nullable=False,
+        index=True,
+    ),
+    Column("data", JSON().with_variant(JSONB(), "postgresql"), nullable=False),
+)
+
+
+async def upgrade(context: MigrationContext) -> None:
+    await context.connection.run_sync(form_versions.create, checkfirst=True)
+    await context.add_column("forms", "version_id", "INTEGER")
+
+    if context.dialect == "postgresql":
+        # NOT VALID skips checking the existing rows while holding the lock;
+        # they are validated once the backfill is done.
+        await context.add_column("answers", "version_id", "INTEGER")
+        constraint = await context.scalar(
+            "SELECT 1 FROM pg_constraint WHERE conname = 'answers_version_id_fkey'"
+        )
+        if not constraint:
+            await context.execute(
+                """
+                ALTER TABLE answers ADD CONSTRAINT answers_version_id_fkey
+                FOREIGN KEY (version_id) REFERENCES form_versions (id)
+                ON DELETE CASCADE NOT VALID
+                """
+            )
+    else:
+        await context.add_column(
+            "answers",
+            "version_id",
+            "INTEGER REFERENCES form_versions (id) ON DELETE CASCADE",
+        )
+
+    # Every form gets its current data as the first version, which all of its
+    # answers belong to: editing used to delete them.
+    async with context.transaction() as connection:
+        await connection.exec_driver_sql(
+            """
+            INSERT INTO form_versions (form_id, data)
+            SELECT id, data FROM forms WHERE version_id IS NULL
+            """
+        )
+        await connection.exec_driver_sql(
+            """
+            UPDATE forms SET version_id = (
+                SELECT max(id) FROM form_versions
+                WHERE form_versions.form_id = forms.id
+            )
+            WHERE version_id IS NULL
+            """
+        )
+
+    await context.backfill(
+        "answers",
+        "version_id = (SELECT version_id FROM forms WHERE forms.id = answers.form_id)",
+        "version_id IS NULL",
+    )
+
+    if context.dialect == "postgresql":
+        await context.execute(
+            "ALTER TABLE answers VALIDATE CONSTRAINT answers_version_id_fkey"
+        )
+    await context.create_index("ix_answers_version_id", "answers", "(version_id, id)")
@@ -0,0 +1,13 @@
+from .runner import MigrationContext
+
+VERSION = 4
+
+
+async def upgrade(context: MigrationContext) -> None:
+    # Nullable columns without a default, so adding them does not rewrite
+    # the tables.
+    await context.add_column("users", "deleted_at", "TIMESTAMP WITH TIME ZONE")
+    await context.add_column("forms", "deleted_at", "TIMESTAMP WITH TIME ZONE")
+    await context.create_index(
+        "ix_forms_deleted_at", "forms", "(deleted_at) WHERE deleted_at IS NOT NULL"
+    )
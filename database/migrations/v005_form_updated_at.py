@@ -0,0 +1,9 @@
+from .runner import MigrationContext
+
+VERSION = 5
+
+
+async def upgrade(context: MigrationContext) -> None:
+    # Left empty for existing forms rather than pretending they were all
+    # modified at migration time.
+    await context.add_column("forms", "updated_at", "TIMESTAMP WITH TIME ZONE")
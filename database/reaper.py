@@ -0,0 +1,158 @@
+import asyncio
+import logging
+
+from sqlalchemy import ColumnElement, delete, exists, func, select, update
+
+import database
+from database.counter import reset_counters
+
+
+# Deletes data that is no longer reachable in the background, a chunk per
+# short transaction, instead of in the request that made it unreachable.
+class Reaper:
+    def __init__(self, interval: float, batch_size: int, pause: float) -> None:
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self._stopping = asyncio.Event()
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping.clear()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        self._stopping.set()
+        await task
+
+    async def reap(self) -> None:
+        await self.prune_versions()
+        await self.purge_forms()
+        await self.purge_users()
+
+    async def prune_versions(self) -> None:
+        # Answers to replaced form versions are hidden as soon as the form is
+        # edited, and can be deleted at leisure.
+        stmt = (
+            select(database.FormVersion.id)
+            .join(database.Form, database.Form.id == database.FormVersion.form_id)
+            .where(database.FormVersion.id != database.Form.version_id)
+        )
+        async with database.sessions() as session:
+            versions = list(await session.scalars(stmt))
+
+        for version_id in versions:
+            deleted = await self.delete_chunked(
+                database.Answer, database.Answer.version_id == version_id
+            )
+            if self._stopping.is_set():
+                return
+
+            # Rows still locked by another worker's reaper are left to it.
+            async with database.sessions.begin() as session:
+                result = await session.execute(
+                    delete(database.FormVersion).where(
+                        database.FormVersion.id == version_id,
+                        ~exists().where(database.Answer.version_id == version_id),
+                    )
+                )
+            if result.rowcount:
+                logging.info(
+                    "Pruned form version %d with %d answers", version_id, deleted
+                )
+
+    async def purge_forms(self) -> None:
+        stmt = select(database.Form.id).where(database.Form.deleted_at.is_not(None))
+        async with database.sessions() as session:
+            forms = list(await session.scalars(stmt))
+
+        for form_id in forms:
+            deleted = await self.delete_chunked(
+                database.Answer, database.Answer.form_id == form_id
+            )
+            if self._stopping.is_set():
+                return
+
+            # What is left is bounded by the size of the form, not by the
+            # number of its answers.
+            async with database.sessions.begin() as session:
+                await reset_counters(session, form_id)
+                await session.execute(
+                    delete(database.FormVersion).where(
+                        database.FormVersion.form_id == form_id,
+                        ~exists().where(database.Answer.form_id == form_id),
+                    )
+                )
+                result = await session.execute(
+                    delete(database.Form).where(
+                        database.Form.id == form_id,
+                        ~exists().where(database.Answer.form_id == form_id),
+                    )
+                )
+            if result.rowcount:
+                logging.info("Purged form %d with %d answers", form_id, deleted)
+
+    async def purge_users(self) -> None:
+        deleted = database.User.deleted_at.is_not(None)
+        async with database.sessions.begin() as session:
+            # Forms created while the user was being deleted are caught here
+            # and purged on the next pass.
+            await session.execute(
+                update(database.Form)
+                .where(
+                    database.Form.owner_id.in_(select(database.User.id).where(deleted)),
+                    database.Form.deleted_at.is_(None),
+                )
+                .values(deleted_at=func.now())
+            )
+            result = await session.execute(
+                delete(database.User)
+                .where(
+                    deleted,
+                    ~exists().where(database.Form.owner_id == database.User.id),
+                )
+                .returning(database.User.id)
+            )
+            for user_id in result.scalars():
+                logging.info("Purged user %d", user_id)
+
+    async def delete_chunked(
+        self, model: type[database.Base], condition: ColumnElement[bool]
+    ) -> int:
+        # SKIP LOCKED lets the reapers of several workers share the work
+        # instead of queueing up behind each other.
+        chunk = (
+            select(model.id)
+            .where(condition)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        )
+        total = 0
+        while not self._stopping.is_set():
+            async with database.sessions.begin() as session:
+                result = await session.execute(
+                    delete(model).where(model.id.in_(chunk.scalar_subquery()))
+                )
+            if not result.rowcount:
+                break
+
+            total += result.rowcount
+            await asyncio.sleep(self.pause)
+        return total
+
+    async def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                await self.reap()
+            except Exception:
+                logging.exception("Failed to reap deleted data")
+
+            try:
+                await asyncio.wait_for(self._stopping.wait(), self.interval)
+            except TimeoutError:
+                pass
@@ -1,3 +1,6 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime
 from sqlalchemy.orm import Mapped, mapped_column
 
 from database import Base
@@ -10,3 +13,5 @@ class User(Base):
     username: Mapped[str] = mapped_column(unique=True)
     password: Mapped[str]
     salt: Mapped[str]
+    # Set when the user is deleted; the reaper removes the row later on.
+    deleted_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+from collections import Counter
+
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError, NoResultFound
+
+import database
+from database.counter import answer_keys, update_counters
+
+# Form id, form version id and answer data.
+Row = tuple[int, int, dict]
+
+
+class AnswerWriter:
+    def __init__(self, batch_size: int, interval: float) -> None:
+        self.batch_size = batch_size
+        self.interval = interval
+        self._queue: asyncio.Queue[tuple[Row, asyncio.Future] | None] = asyncio.Queue()
+        self._task: asyncio.Task | None = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        await self._queue.put(None)
+        await task
+
+    async def write(self, form_id: int, version_id: int, data: dict) -> int | None:
+        if self._task is None:
+            return (await self.insert([(form_id, version_id, data)]))[0]
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(((form_id, version_id, data), future))
+        return await future
+
+    async def insert(self, rows: list[Row]) -> list[int | None]:
+        # Answers validated against a form version that has been replaced
+        # meanwhile are skipped and come back as None. A form that does not
+        # exist or has been deleted fails the whole call. Locking the forms
+        # orders the insert against edit_form, which resets the counters.
+        versions_stmt = (
+            select(database.Form.id, database.Form.version_id)
+            .where(
+                database.Form.id.in_({form_id for form_id, _, _ in rows}),
+                database.Form.deleted_at.is_(None),
+            )
+            .order_by(database.Form.id)
+            .with_for_update(read=True)
+        )
+        stmt = insert(database.Answer).returning(
+            database.Answer.id, sort_by_parameter_order=True
+        )
+
+        async with database.sessions.begin() as session:
+            versions = dict((await session.execute(versions_stmt)).tuples().all())
+            if any(form_id not in versions for form_id, _, _ in rows):
+                raise NoResultFound("Form not found")
+            current = [
+                i
+                for i, (form_id, version_id, _) in enumerate(rows)
+                if versions[form_id] == version_id
+            ]
+
+            ids: list[int | None] = [None] * len(rows)
+            if not current:
+                return ids
+
+            fresh = [rows[i] for i in current]
+            result = await session.execute(
+                stmt,
+                [
+                    {"form_id": form_id, "version_id": version_id, "data": data}
+                    for form_id, version_id, data in fresh
+                ],
+            )
+            for i, answer_id in zip(current, result.scalars()):
+                ids[i] = answer_id
+
+            counts: dict[int, Counter] = {}
+            for form_id, _, data in fresh:
+                counts.setdefault(form_id, Counter()).update(answer_keys(data))
+            for form_id, form_counts in sorted(counts.items()):
+                await update_counters(session, form_id, form_counts)
+
+            return ids
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = await asyncio.wait_for(
+                        self._queue.get(), deadline - loop.time()
+                    )
+                except TimeoutError:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[Row, asyncio.Future]]) -> None:
+        try:
+            ids = await self.insert([row for row, _ in batch])
+        except (IntegrityError, NoResultFound):
+            # One bad row (e.g. a form deleted meanwhile) must not fail
+            # the whole batch, so fall back to inserting rows one by one.
+            for row, future in batch:
+                try:
+                    answer_id = (await self.insert([row]))[0]
+                except Exception as e:
+                    _set_exception(future, e)
+                else:
+                    _set_result(future, answer_id)
+        except Exception as e:
+            logging.exception("Failed to write a batch of %d answers", len(batch))
+            for _, future in batch:
+                _set_exception(future, e)
+        else:
+            for (_, future), answer_id in zip(batch, ids):
+                _set_result(future, answer_id)
+
+
+def _set_result(future: asyncio.Future, result: int | None) -> None:
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_exception(future: asyncio.Future, exception: Exception) -> None:
+    if not future.done():
+        future.set_exception(exception)
@@ -1,35 +1,133 @@
+import asyncio
 import logging
+import os
+import socket
+import sys
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from uvicorn.main import STARTUP_FAILURE
+from uvicorn.supervisors import Multiprocess
 
 import models
 import database
+from database import migrations
 import routes
+from utils import JSONResponse, LocalBroker, MetricsMiddleware, ProfilingMiddleware
 
 logging.basicConfig(level=logging.INFO)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    logging.info("Creating tables in database")
-    async with database.engine.begin() as connection:
-        await connection.run_sync(database.Base.metadata.create_all)
+    if models.settings.MIGRATE_ON_STARTUP:
+        await migrations.migrate()
+
+    await routes.utils.broker.start()
+    routes.live.live_results.start()
+    if models.settings.ANSWER_BATCHING:
+        database.answer_writer.start()
+    if models.settings.REAPER_INTERVAL > 0:
+        database.reaper.start()
     yield
+    # Uvicorn has stopped accepting connections and drained in-flight
+    # requests by now; flush what is still queued before letting go.
+    await database.answer_writer.stop()
+    await database.reaper.stop()
+    await routes.live.live_results.stop()
+    await routes.utils.broker.stop()
+    await database.engine.dispose()
+    if database.replica_engine is not database.engine:
+        await database.replica_engine.dispose()
+
+
+def create_app() -> FastAPI:
+    app = FastAPI(lifespan=lifespan, default_response_class=JSONResponse)
+    app.include_router(routes.router)
+
+    settings = models.settings
+    if settings.PROFILING or settings.PROFILE_ROUTE or settings.PROFILE_TOKEN:
+        app.add_middleware(
+            ProfilingMiddleware,
+            profiler=routes.utils.profiler,
+            spans=settings.PROFILING,
+            route=settings.PROFILE_ROUTE,
+            sample_rate=settings.PROFILE_SAMPLE_RATE,
+            token=settings.PROFILE_TOKEN,
+            interval=settings.PROFILE_INTERVAL / 1000,
+        )
+    # Added last so that it wraps the profiler and its request stats are
+    # still available when the profiler records its spans.
+    app.add_middleware(MetricsMiddleware, registry=routes.utils.route_metrics)
+
+    if settings.all_cors_origins:
+        app.add_middleware(
+            CORSMiddleware,
+            allow_origins=settings.all_cors_origins,
+            allow_credentials=True,
+            allow_methods=["*"],
+            allow_headers=["*"],
+        )
+
+    return app
+
 
+class Server(uvicorn.Server):
+    # Uvicorn waits for open connections to finish before the lifespan
+    # shutdown, so live result streams are ended as soon as it begins.
+    async def shutdown(self, sockets: list[socket.socket] | None = None) -> None:
+        routes.live.live_results.close()
+        await super().shutdown(sockets)
 
-app = FastAPI(lifespan=lifespan)
-app.include_router(routes.router)
 
-if models.settings.all_cors_origins:
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=models.settings.all_cors_origins,
-        allow_credentials=True,
-        allow_methods=["*"],
-        allow_headers=["*"],
+async def prepare() -> None:
+    try:
+        await migrations.migrate()
+    finally:
+        await database.engine.dispose()
+
+
+def run() -> None:
+    settings = models.settings
+    workers = settings.WORKERS or os.cpu_count() or 1
+
+    # Migrate once here instead of racing in every worker's lifespan. The
+    # workers are spawned fresh and read the override from the environment.
+    if settings.MIGRATE_ON_STARTUP:
+        asyncio.run(prepare())
+        os.environ["MIGRATE_ON_STARTUP"] = "false"
+
+    if workers > 1 and isinstance(routes.utils.broker, LocalBroker):
+        logging.warning(
+            "Running %d workers with a local broker, caches will not be "
+            "invalidated across workers",
+            workers,
+        )
+
+    config = uvicorn.Config(
+        "main:create_app",
+        factory=True,
+        host="0.0.0.0",
+        port=settings.PORT,
+        workers=workers,
+        loop=settings.SERVER_LOOP,
+        http=settings.SERVER_HTTP,
+        timeout_graceful_shutdown=settings.SHUTDOWN_TIMEOUT,
     )
+    server = Server(config)
+    try:
+        if config.workers > 1:
+            sockets = [config.bind_socket()]
+            Multiprocess(config, target=server.run, sockets=sockets).run()
+        else:
+            server.run()
+    except KeyboardInterrupt:
+        pass
+    if not server.started and config.workers == 1:
+        sys.exit(STARTUP_FAILURE)
+
 
-uvicorn.run(app, host="0.0.0.0", port=models.settings.PORT)
+if __name__ == "__main__":
+    run()
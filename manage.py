@@ -0,0 +1,135 @@
+import argparse
+import asyncio
+import json
+import logging
+
+from sqlalchemy import select
+
+import database
+from database import migrations
+from models import AnswerData, CompiledForm, FormData
+from routes import stats
+
+logging.basicConfig(level=logging.INFO)
+
+live_forms = select(database.Form.id).where(database.Form.deleted_at.is_(None))
+
+
+async def rebuild_counters(args: argparse.Namespace) -> None:
+    await migrations.migrate()
+
+    form_ids = args.form_id
+    if not form_ids:
+        async with database.sessions() as session:
+            form_ids = list(await session.scalars(live_forms))
+
+    for form_id in form_ids:
+        async with database.sessions.begin() as session:
+            await stats.rebuild_counters(session, form_id)
+        logging.info("Rebuilt result counters for form %d", form_id)
+
+
+async def validate_answers(args: argparse.Namespace) -> None:
+    form_ids = args.form_id
+    if not form_ids:
+        async with database.sessions() as session:
+            form_ids = list(await session.scalars(live_forms))
+
+    # Every answer is checked against the form version it was submitted to.
+    invalid = 0
+    for form_id in form_ids:
+        async with database.sessions() as session:
+            versions = (
+                await session.execute(
+                    select(database.FormVersion.id, database.FormVersion.data).where(
+                        database.FormVersion.form_id == form_id
+                    )
+                )
+            ).all()
+            if not versions:
+                logging.warning("Form %d does not exist", form_id)
+                continue
+
+            for version_id, form_data in versions:
+                compiled = CompiledForm(FormData.model_validate(form_data), version_id)
+
+                stmt = (
+                    select(database.Answer.id, database.Answer.data)
+                    .where(database.Answer.version_id == version_id)
+                    .order_by(database.Answer.id)
+                    .execution_options(yield_per=args.batch_size)
+                )
+                result = await session.stream(stmt)
+                async for partition in result.partitions():
+                    answers = []
+                    for answer_id, data in partition:
+                        try:
+                            answers.append((answer_id, AnswerData.model_validate(data)))
+                        except ValueError as e:
+                            invalid += 1
+                            print(json.dumps({"id": answer_id, "error": str(e)}))
+
+                    errors = compiled.validate_many([answer for _, answer in answers])
+                    for (answer_id, _), error in zip(answers, errors):
+                        if error is not None:
+                            invalid += 1
+                            print(json.dumps({"id": answer_id, "error": error}))
+
+        logging.info("Validated answers to form %d", form_id)
+
+    logging.info("Found %d invalid answers", invalid)
+
+
+async def reap(args: argparse.Namespace) -> None:
+    await migrations.migrate()
+    await database.reaper.reap()
+
+
+async def migrate(args: argparse.Namespace) -> None:
+    await migrations.migrate()
+
+
+async def show_version(args: argparse.Namespace) -> None:
+    async with database.engine.connect() as connection:
+        version = await migrations.applied_version(connection)
+    latest = migrations.MIGRATIONS[-1].version
+    print(f"Schema version {version or 0}, latest {latest}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    try:
+        await args.command(args)
+    finally:
+        await database.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Formaptix management commands")
+    commands = parser.add_subparsers(required=True)
+
+    command = commands.add_parser(
+        "rebuild-counters", help="Recompute result counters from stored answers"
+    )
+    command.add_argument("form_id", type=int, nargs="*")
+    command.set_defaults(command=rebuild_counters)
+
+    command = commands.add_parser(
+        "validate-answers",
+        help="Check stored answers against their forms and print the invalid ones",
+    )
+    command.add_argument("form_id", type=int, nargs="*")
+    command.add_argument("--batch-size", type=int, default=10000)
+    command.set_defaults(command=validate_answers)
+
+    command = commands.add_parser(
+        "reap", help="Delete replaced form versions and deleted forms and users now"
+    )
+    command.set_defaults(command=reap)
+
+    command = commands.add_parser("migrate", help="Apply pending schema migrations")
+    command.set_defaults(command=migrate)
+
+    command = commands.add_parser("version", help="Show the applied schema version")
+    command.set_defaults(command=show_version)
+
+    asyncio.run(main(parser.parse_args()))
@@ -10,3 +10,4 @@ from .settings import settings
 from .user import *
 from .form import *
 from .answer import *
+from .identifier import *
@@ -1,11 +1,12 @@
 from enum import Enum
+from types import MappingProxyType
 from uuid import UUID
-from typing import Annotated, Union, Literal
+from typing import Annotated, Sequence, Union, Literal
 
 from pydantic import field_validator, field_serializer, Field
 
 from models import BaseModel, form
-from utils import validate_tin, validate_snils
+from utils import validate_tin, validate_snils, validate_tins, validate_snilses
 
 
 class AnswerError(Enum):
@@ -21,6 +22,16 @@ class AnswerError(Enum):
     SCALE_VALUE_NOT_IN_RANGE = "The scale value must be within the specified range."
 
 
+class ExportFormat(Enum):
+    csv = "csv"
+    parquet = "parquet"
+
+
+class ImportFormat(Enum):
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class BaseValue(BaseModel):
     question_id: UUID
     question_type: form.QuestionType
@@ -34,12 +45,15 @@ class TextValue(BaseValue):
     question_type: Literal[form.QuestionType.text] = form.QuestionType.text
     value: str
 
-    def validate(self, question: form.TextQuestion) -> None:
+    def validate(self, question: form.TextQuestion, checksums: bool = True) -> None:
         if question.min_length and len(self.value) < question.min_length:
             raise ValueError(AnswerError.TOO_SHORT.value)
         if question.max_length and len(self.value) > question.max_length:
             raise ValueError(AnswerError.TOO_LONG.value)
 
+        if not checksums:
+            return
+
         if (
             question.validator == form.TextValidator.tin
             and validate_tin(self.value) is False
@@ -108,6 +122,73 @@ class AnswerData(BaseModel):
         return v
 
 
+class CompiledForm:
+    __slots__ = ("questions", "required", "version_id")
+
+    def __init__(self, form_data: form.FormData, version_id: int | None = None) -> None:
+        self.version_id = version_id
+        questions = form_data.questions
+        self.questions = MappingProxyType(
+            {question.id: question for question in questions}
+        )
+        self.required = frozenset(
+            question.id for question in questions if question.required
+        )
+
+    def validate(self, answer_data: AnswerData, checksums: bool = True) -> None:
+        uuids = answer_data.question_uuids
+        if not self.required.issubset(uuids):
+            raise ValueError(AnswerError.REQUIRED_QUIESTION_NOT_ANSWERED.value)
+
+        for question_id, value in uuids.items():
+            question = self.questions.get(question_id)
+            if question is None:
+                raise ValueError(AnswerError.INCORRECT_IDS.value)
+            if question.question_type != value.question_type:
+                raise ValueError(AnswerError.REQUIRED_QUIESTION_NOT_ANSWERED.value)
+            if isinstance(value, TextValue):
+                value.validate(question, checksums)
+            else:
+                value.validate(question)
+
+    def validate_many(self, answers: Sequence[AnswerData]) -> list[str | None]:
+        # TIN and SNILS checksums are checked in one batch per validator
+        # instead of answer by answer.
+        errors: list[str | None] = [None] * len(answers)
+        pending: dict[form.TextValidator, tuple[list[int], list[str]]] = {
+            validator: ([], []) for validator in CHECKSUMS
+        }
+
+        for i, answer_data in enumerate(answers):
+            try:
+                self.validate(answer_data, checksums=False)
+            except ValueError as e:
+                errors[i] = str(e)
+                continue
+
+            for value in answer_data.values:
+                if isinstance(value, TextValue):
+                    validator = self.questions[value.question_id].validator
+                    if validator is not None:
+                        indexes, values = pending[validator]
+                        indexes.append(i)
+                        values.append(value.value)
+
+        for validator, (indexes, values) in pending.items():
+            check, error = CHECKSUMS[validator]
+            for i, valid in zip(indexes, check(values)):
+                if not valid and errors[i] is None:
+                    errors[i] = error.value
+
+        return errors
+
+
+CHECKSUMS = {
+    form.TextValidator.tin: (validate_tins, AnswerError.TIN_VALIDATION_FAILED),
+    form.TextValidator.snils: (validate_snilses, AnswerError.SNILS_VALIDATION_FAILED),
+}
+
+
 class Answer(BaseModel):
     id: int
     form: Annotated[form.Form, Field(exclude=True)]
@@ -116,18 +197,5 @@ class Answer(BaseModel):
     @field_validator("data")
     @classmethod
     def answer_validator(cls, v, info):
-        uuids = v.question_uuids
-        questions = info.data["form"].data.questions
-        for question in questions:
-            if question.required and question.id not in uuids:
-                raise ValueError(AnswerError.REQUIRED_QUIESTION_NOT_ANSWERED.value)
-            if uuids.get(question.id):
-                if question.question_type != uuids[question.id].question_type:
-                    raise ValueError(AnswerError.REQUIRED_QUIESTION_NOT_ANSWERED.value)
-                uuids[question.id].validate(question)
-    
-                del uuids[question.id]
-
-        if len(uuids) > 0:
-            raise ValueError(AnswerError.INCORRECT_IDS.value)
+        CompiledForm(info.data["form"].data).validate(v)
         return v
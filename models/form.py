@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import IntEnum, Enum
 from typing import Annotated, Union, Literal
 from uuid import UUID, uuid4
@@ -170,3 +171,10 @@ class FormData(BaseModel):
 class Form(BaseModel):
     id: int
     data: FormData
+
+
+class FormSummary(BaseModel):
+    id: int
+    name: str
+    answers: int
+    updated_at: datetime | None
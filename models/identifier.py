@@ -0,0 +1,18 @@
+from typing import Annotated
+
+from pydantic import Field
+
+from models import BaseModel
+from models.settings import settings
+
+Identifiers = Annotated[list[str], Field(max_length=settings.VALIDATE_BATCH_LIMIT)]
+
+
+class IdentifierBatch(BaseModel):
+    tin: Identifiers = []
+    snils: Identifiers = []
+
+
+class IdentifierResults(BaseModel):
+    tin: list[bool]
+    snils: list[bool]
@@ -1,4 +1,4 @@
-from typing import Annotated, Any
+from typing import Annotated, Any, Literal
 
 from pydantic import AnyUrl, BeforeValidator, computed_field
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -21,6 +21,22 @@ class Settings(BaseSettings):
     SECRET: str
     PORT: int
 
+    WORKERS: int = 1  # 0 starts one per CPU core
+    SERVER_LOOP: Literal["auto", "asyncio", "uvloop"] = "auto"
+    SERVER_HTTP: Literal["auto", "h11", "httptools"] = "auto"
+    SHUTDOWN_TIMEOUT: int = 30  # seconds
+    BROKER: Literal["auto", "local", "postgres"] = "auto"
+
+    DATABASE_POOL_SIZE: int = 5
+    DATABASE_MAX_OVERFLOW: int = 10
+    DATABASE_POOL_TIMEOUT: int = 30  # seconds
+    DATABASE_POOL_RECYCLE: int = -1  # seconds
+    DATABASE_POOL_PRE_PING: bool = False
+    DATABASE_STATEMENT_CACHE_SIZE: int = 100  # asyncpg, per connection
+
+    DATABASE_REPLICA: str | None = None
+    REPLICA_PIN_TTL: int = 5  # seconds, should exceed the replication lag
+
     FRONTEND_HOST: str = "http://localhost:5173"
     BACKEND_CORS_ORIGINS: Annotated[list[AnyUrl] | str, BeforeValidator(parse_cors)] = (
         []
@@ -36,5 +52,41 @@ class Settings(BaseSettings):
     ADMIN_PASSWORD: str
     DISABLE_ADMIN: bool = False
 
+    PROFILING: bool = False
+    PROFILE_ROUTE: str | None = None  # path to capture flamegraphs of
+    PROFILE_SAMPLE_RATE: float = 0.01
+    PROFILE_TOKEN: str | None = None  # x-profile header forcing a capture
+    PROFILE_INTERVAL: int = 5  # milliseconds between stack samples
+    PROFILE_KEEP: int = 50
+
+    MIGRATE_ON_STARTUP: bool = True
+    MIGRATION_BATCH_SIZE: int = 5000
+    MIGRATION_BATCH_PAUSE: int = 100  # milliseconds
+
+    REAPER_INTERVAL: int = 60  # seconds, 0 disables the reaper
+    REAPER_BATCH_SIZE: int = 5000
+    REAPER_BATCH_PAUSE: int = 100  # milliseconds
+
+    FORM_CACHE_SIZE: int = 1024
+    FORM_RESPONSE_CACHE_SIZE: int = 64 * 1024 * 1024  # bytes
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL: int = 60  # seconds
+
+    PASSWORD_HASHER: Literal["scrypt", "pbkdf2"] = "scrypt"
+    PASSWORD_HASH_COST: int | None = None
+    PASSWORD_HASH_WORKERS: int = 4
+
+    ANSWER_BATCHING: bool = False
+    ANSWER_BATCH_SIZE: int = 500
+    ANSWER_BATCH_INTERVAL: int = 10  # milliseconds
+
+    VALIDATE_BATCH_LIMIT: int = 100_000
+
+    IMPORT_BATCH_SIZE: int = 5000
+    IMPORT_MAX_ERRORS: int = 1000
+    IMPORT_MAX_ROW_SIZE: int = 131072  # characters
+
+    LIVE_INTERVAL: int = 1000  # milliseconds
+
 
 settings = Settings()
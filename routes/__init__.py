@@ -4,6 +4,8 @@ from . import admin
 from . import user
 from . import form
 from . import answer
+from . import metrics
+from . import validate
 
 router = APIRouter()
 
@@ -11,3 +13,5 @@ router.include_router(admin.router)
 router.include_router(user.router)
 router.include_router(form.router)
 router.include_router(answer.router)
+router.include_router(metrics.router)
+router.include_router(validate.router)
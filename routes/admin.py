@@ -1,13 +1,14 @@
 import secrets
 
 from fastapi import APIRouter, HTTPException
-from sqlalchemy import select, delete
+from sqlalchemy import func, select, update
 
 import database
+from utils import TimedRoute
 from models import settings, user, DeleteUser
-from .utils import Admin, hash_password
+from .utils import Admin, passwords, forget_user, invalidate_form, pin_primary
 
-router = APIRouter(prefix="/admin")
+router = APIRouter(prefix="/admin", route_class=TimedRoute)
 
 
 @router.post("/user")
@@ -20,6 +21,7 @@ async def create_user(auth: user.Auth, admin_token: Admin):
         raise HTTPException(403, "You are not admin")
 
     salt = secrets.token_hex(8)
+    password = await passwords.hash(auth.password.strip(), salt)
 
     async with database.sessions.begin() as session:
         stmt = select(database.User).where(
@@ -27,12 +29,14 @@ async def create_user(auth: user.Auth, admin_token: Admin):
         )
         db_request = await session.execute(stmt)
         user = db_request.scalar_one_or_none()
+        if user is not None and user.deleted_at is not None:
+            raise HTTPException(400, "User with this username is being deleted")
         if user is not None:
             raise HTTPException(400, "User with this username already exists")
 
         new_user = database.User(
             username=auth.username.strip(),
-            password=hash_password(auth.password.strip(), salt),
+            password=password,
             salt=salt,
         )
         session.add(new_user)
@@ -40,8 +44,32 @@ async def create_user(auth: user.Auth, admin_token: Admin):
 
 @router.delete("/user")
 async def delete_user(user: DeleteUser, admin_token: Admin):
+    # The user and their forms are hidden right away, and the reaper deletes
+    # them with all the answers in the background.
     async with database.sessions.begin() as session:
-        stmt = delete(database.User).where(
-            database.User.username == user.username.strip()
+        stmt = (
+            update(database.User)
+            .where(
+                database.User.username == user.username.strip(),
+                database.User.deleted_at.is_(None),
+            )
+            .values(deleted_at=func.now())
+            .returning(database.User.id)
         )
-        await session.execute(stmt)
+        user_id = (await session.execute(stmt)).scalar_one_or_none()
+        if user_id is None:
+            return
+
+        stmt = (
+            update(database.Form)
+            .where(
+                database.Form.owner_id == user_id, database.Form.deleted_at.is_(None)
+            )
+            .values(deleted_at=func.now())
+            .returning(database.Form.id)
+        )
+        form_ids = list((await session.execute(stmt)).scalars())
+
+    await pin_primary(f"user:{user_id}", *(f"form:{form_id}" for form_id in form_ids))
+    await forget_user(user_id)
+    await invalidate_form(*form_ids)
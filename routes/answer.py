@@ -1,52 +1,416 @@
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import select, and_
-from pydantic import ValidationError
+import asyncio
+import heapq
+import json
+import logging
+from collections import Counter
+from typing import Annotated
+
+from uuid import UUID
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement, Select, select, delete, and_
+from sqlalchemy.exc import IntegrityError, NoResultFound, SQLAlchemyError
 
 import database
-from models import AnswerData, Answer
-from .utils import User
+from utils import TimedRoute, UploadStreamingResponse, span
+from database.counter import (
+    ANSWERED,
+    RESPONSES,
+    Key,
+    answer_keys,
+    read_counters,
+    update_counters,
+)
+from models import (
+    AnswerData,
+    CompiledForm,
+    ExportFormat,
+    FormData,
+    ImportFormat,
+    QuestionType,
+    settings,
+)
+from . import export, importer, stats
+from .live import live_results
+from .utils import (
+    StreamUser,
+    User,
+    compiled_forms,
+    get_compiled_form,
+    get_owned_form,
+    pin_primary,
+    reader,
+)
+
+router = APIRouter(prefix="/answer", route_class=TimedRoute)
 
-router = APIRouter(prefix="/answer")
+LIVE_KEEPALIVE = 15  # seconds
 
 
 @router.post("/create")
 async def create_answer(form_id: int, answer_data: AnswerData):
-    async with database.sessions.begin() as session:
-        answer = database.Answer(
-            form_id=form_id,
-            data=answer_data.model_dump(),
+    compiled = await get_compiled_form(form_id)
+    if compiled is None:
+        raise HTTPException(404, "Form not found")
+
+    try:
+        with span("validation"):
+            compiled.validate(answer_data)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+    try:
+        answer_id = await database.answer_writer.write(
+            form_id, compiled.version_id, answer_data.model_dump()
         )
+    except (IntegrityError, NoResultFound):
+        raise HTTPException(404, "Form not found")
+    if answer_id is None:
+        compiled_forms.invalidate(form_id)
+        raise HTTPException(409, "The form has been changed")
 
-        session.add(answer)
-        await session.flush()
-        await session.refresh(answer)
+    live_results.touch(form_id)
+    return {"id": answer_id, "data": answer_data}
 
-        try:
-            answer_model = Answer.model_validate(answer)
-        except ValidationError as e:
-            raise HTTPException(400, e.errors()[0].get("msg"))
 
-        return answer_model
+async def answer_filter(
+    form_id: int,
+    question: UUID | None = None,
+    option: int | None = None,
+    value: str | None = None,
+) -> ColumnElement[bool] | None:
+    if question is None:
+        return None
+    if database.engine.dialect.name != "postgresql":
+        raise HTTPException(501, "Answer filters require PostgreSQL")
+
+    compiled = await get_compiled_form(form_id)
+    if compiled is None or question not in compiled.questions:
+        raise HTTPException(400, "Unknown question")
+
+    match: dict = {"question_id": str(question)}
+    question_type = compiled.questions[question].question_type
+    if question_type == QuestionType.selector:
+        if option is None:
+            raise HTTPException(400, "Option must be specified")
+        match["values"] = [option]
+    elif value is None:
+        raise HTTPException(400, "Value must be specified")
+    elif question_type == QuestionType.scale:
+        if not value.isdecimal():
+            raise HTTPException(400, "Value must be an integer")
+        match["value"] = int(value)
+    else:
+        match["value"] = value
+
+    # Served by the GIN jsonb_path_ops index on answers.data.
+    return database.Answer.data.contains({"values": [match]})
+
+
+Filter = Annotated[ColumnElement[bool] | None, Depends(answer_filter)]
+
+
+def answers_query(
+    user: database.User,
+    form_id: int,
+    after: int | None,
+    condition: ColumnElement[bool] | None = None,
+) -> Select:
+    stmt = (
+        select(database.Answer.id, database.Answer.data)
+        .join(database.Answer.form)
+        .where(
+            and_(
+                database.Answer.form_id == form_id,
+                database.Answer.version_id == database.Form.version_id,
+                database.Form.owner_id == user.id,
+                database.Form.deleted_at.is_(None),
+            )
+        )
+        .order_by(database.Answer.id)
+    )
+    if after is not None:
+        stmt = stmt.where(database.Answer.id > after)
+    if condition is not None:
+        stmt = stmt.where(condition)
+    return stmt
 
 
 @router.get("/get")
-async def get_answers(user: User, form_id: int):
-    async with database.sessions.begin() as session:
-        return {
-            "answers": [
-                Answer.model_validate(item)
-                for item in await session.scalars(
-                    select(database.Answer)
-                    .where(
-                        and_(
-                            database.Answer.form_id == form_id,
-                            database.Form.owner_id == user.id,
-                        )
-                    )
-                    .join(database.Answer.form)
+async def get_answers(
+    user: User,
+    form_id: int,
+    condition: Filter,
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    async with reader(f"user:{user.id}").begin() as session:
+        db_request = await session.execute(
+            answers_query(user, form_id, after, condition).limit(limit)
+        )
+        answers = [{"id": id, "data": data} for id, data in db_request]
+
+    return {
+        "answers": answers,
+        "next": answers[-1]["id"] if len(answers) == limit else None,
+    }
+
+
+@router.get("/stream")
+async def stream_answers(
+    user: User, form_id: int, condition: Filter, after: int | None = None
+):
+    stmt = answers_query(user, form_id, after, condition).execution_options(
+        yield_per=1000
+    )
+
+    async def lines():
+        async with reader(f"user:{user.id}").begin() as session:
+            result = await session.stream(stmt)
+            async for partition in result.partitions():
+                yield "".join(
+                    json.dumps({"id": id, "data": data}) + "\n"
+                    for id, data in partition
+                )
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@router.get("/export")
+async def export_answers(
+    user: User,
+    form_id: int,
+    condition: Filter,
+    format: ExportFormat = ExportFormat.csv,
+):
+    async with reader(f"user:{user.id}").begin() as session:
+        form = await get_owned_form(session, user, form_id)
+        questions = FormData.model_validate(form.data).questions
+
+    if format == ExportFormat.parquet and export.pyarrow is None:
+        raise HTTPException(501, "Parquet export requires pyarrow to be installed")
+
+    stmt = answers_query(user, form_id, None, condition).execution_options(
+        yield_per=10000
+    )
+
+    async def partitions():
+        async with reader(f"user:{user.id}").begin() as session:
+            result = await session.stream(stmt)
+            async for partition in result.partitions():
+                yield partition
+
+    if format == ExportFormat.parquet:
+        content = export.encode_parquet(questions, partitions())
+        media_type = "application/vnd.apache.parquet"
+    else:
+        content = export.encode_csv(questions, partitions())
+        media_type = "text/csv"
+
+    return StreamingResponse(
+        content,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="form-{form_id}.{format.value}"'
+            )
+        },
+    )
+
+
+class ImportReport:
+    def __init__(self, form_id: int, compiled: CompiledForm) -> None:
+        self.form_id = form_id
+        self.compiled = compiled
+        self.imported = 0
+        self.failed = 0
+        # Rows fail out of order, those rejected by validation only once
+        # their batch is flushed. The heap keeps the earliest ones.
+        self._errors: list[tuple[int, str]] = []
+
+    def fail(self, row: int, error: str) -> None:
+        self.failed += 1
+        heapq.heappush(self._errors, (-row, error))
+        if len(self._errors) > settings.IMPORT_MAX_ERRORS:
+            heapq.heappop(self._errors)
+
+    @property
+    def errors(self) -> list[dict]:
+        return [
+            {"row": -row, "error": error}
+            for row, error in sorted(self._errors, reverse=True)
+        ]
+
+    async def flush(self, batch: list[tuple[int, AnswerData]]) -> None:
+        with span("validation"):
+            errors = self.compiled.validate_many([data for _, data in batch])
+
+        rows, answers = [], []
+        for (row, data), error in zip(batch, errors):
+            if error is None:
+                rows.append(row)
+                answers.append(
+                    (self.form_id, self.compiled.version_id, data.model_dump())
                 )
-            ]
+            else:
+                self.fail(row, error)
+
+        if answers:
+            ids = await database.answer_writer.insert(answers)
+            for row, answer_id in zip(rows, ids):
+                if answer_id is None:
+                    self.fail(row, "The form has been changed")
+                else:
+                    self.imported += 1
+            live_results.touch(self.form_id)
+
+        logging.info(
+            "Importing answers to form %d: %d imported, %d failed",
+            self.form_id,
+            self.imported,
+            self.failed,
+        )
+
+    def progress(self) -> str:
+        progress = {
+            "status": "importing",
+            "imported": self.imported,
+            "failed": self.failed,
         }
+        return json.dumps(progress) + "\n"
+
+    def result(self, row: int | None = None, error: str | None = None) -> str:
+        result: dict = {
+            "status": "done" if error is None else "aborted",
+            "imported": self.imported,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+        if error is not None:
+            result["aborted"] = {"row": row, "error": error}
+        return json.dumps(result) + "\n"
+
+
+# Responds with NDJSON: a progress line after each batch and a final report,
+# which is "done" or, when writing stopped early, "aborted" with the first row
+# that was not written. Rows before it stay imported.
+@router.post("/import")
+async def import_answers(
+    user: User,
+    form_id: int,
+    request: Request,
+    format: ImportFormat = ImportFormat.ndjson,
+):
+    async with database.sessions.begin() as session:
+        form = await get_owned_form(session, user, form_id)
+        form_data = FormData.model_validate(form.data)
+        compiled = CompiledForm(form_data, form.version_id)
+
+    if format == ImportFormat.csv:
+        records = importer.records(request.stream(), settings.IMPORT_MAX_ROW_SIZE)
+        header = await anext(records, [])
+        if isinstance(header, str):
+            raise HTTPException(400, header)
+        try:
+            columns = importer.csv_columns(form_data.questions, header)
+        except ValueError as e:
+            raise HTTPException(400, str(e))
+        rows = importer.parse_csv(columns, records)
+    else:
+        rows = importer.parse_ndjson(request.stream(), settings.IMPORT_MAX_ROW_SIZE)
+
+    # Rows are validated and inserted a batch at a time, so memory stays
+    # bounded however large the upload is. A failed row is reported and
+    # skipped; only the first IMPORT_MAX_ERRORS errors are kept.
+    report = ImportReport(form_id, compiled)
+
+    async def results():
+        batch: list[tuple[int, AnswerData]] = []
+        try:
+            async for row, data in rows:
+                if isinstance(data, str):
+                    report.fail(row, data)
+                    continue
+
+                batch.append((row, data))
+                if len(batch) >= settings.IMPORT_BATCH_SIZE:
+                    await report.flush(batch)
+                    batch = []
+                    yield report.progress()
+
+            if batch:
+                await report.flush(batch)
+            yield report.result()
+        except (IntegrityError, NoResultFound):
+            yield report.result(batch[0][0], "Form not found")
+        except SQLAlchemyError:
+            logging.exception("Failed to import answers to form %d", form_id)
+            yield report.result(batch[0][0], "Failed to write the answers")
+        finally:
+            if report.imported:
+                await pin_primary(f"user:{user.id}")
+
+    return UploadStreamingResponse(results(), media_type="application/x-ndjson")
+
+
+@router.get("/stats")
+async def answer_stats(user: User, form_id: int):
+    async with reader(f"user:{user.id}").begin() as session:
+        form = await get_owned_form(session, user, form_id)
+        questions = FormData.model_validate(form.data).questions
+
+        counts = await read_counters(session, form_id)
+
+    return stats.summarize(questions, counts)
+
+
+def counts_event(event: str, counts: Counter[Key]) -> str:
+    data: dict = {"responses": 0, "answered": {}, "buckets": {}}
+    for (question_id, key), count in sorted(counts.items()):
+        if question_id == RESPONSES:
+            data["responses"] = count
+        elif key == ANSWERED:
+            data["answered"][question_id] = count
+        else:
+            data["buckets"].setdefault(question_id, {})[key] = count
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Server-sent events with the form's result counters: a snapshot first, then
+# the changes since the previous event, at most once per LIVE_INTERVAL. Both
+# carry {"responses": n, "answered": {question_id: n}, "buckets":
+# {question_id: {key: n}}}, a bucket key being a text length, a scale value or
+# a selector option. A delta only holds the counts that changed, as the
+# amounts to add to them.
+@router.get("/subscribe")
+async def subscribe_answers(user: StreamUser, form_id: int):
+    async with database.sessions() as session:
+        await get_owned_form(session, user, form_id)
+
+    async def events():
+        subscription, counts = await live_results.subscribe(form_id)
+        try:
+            yield counts_event("snapshot", counts)
+            while True:
+                try:
+                    delta = await asyncio.wait_for(subscription.next(), LIVE_KEEPALIVE)
+                except TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if delta is None:
+                    break
+                if delta:
+                    yield counts_event("delta", delta)
+        finally:
+            live_results.unsubscribe(form_id, subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @router.delete("/delete")
@@ -60,9 +424,32 @@ async def delete_answer(user: User, id: int):
         db_request = await session.execute(stmt)
         answer = db_request.scalar_one_or_none()
 
-        if answer is None:
+        if answer is None or answer.form.deleted_at is not None:
             raise HTTPException(404, "Answer not found")
         if answer.form.owner_id != user.id:
             raise HTTPException(403, "Forbidden")
 
-        await session.delete(answer)
+        # Held until commit so that an edit of the form cannot reset the
+        # counters between the version check and the decrement.
+        stmt = (
+            select(database.Form.version_id)
+            .where(database.Form.id == answer.form_id)
+            .with_for_update(read=True)
+        )
+        version_id = await session.scalar(stmt)
+
+        stmt = (
+            delete(database.Answer)
+            .where(database.Answer.id == id)
+            .returning(database.Answer.data)
+        )
+        data = (await session.execute(stmt)).scalar_one_or_none()
+        # Answers to replaced versions no longer count towards the results.
+        if data is not None and answer.version_id == version_id:
+            counts = Counter(answer_keys(data))
+            await update_counters(
+                session, answer.form_id, {key: -count for key, count in counts.items()}
+            )
+
+    live_results.touch(answer.form_id)
+    await pin_primary(f"user:{user.id}")
@@ -0,0 +1,95 @@
+import csv
+import io
+from typing import Any, AsyncIterator, Sequence
+
+from models import Question, QuestionType
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+Partitions = AsyncIterator[Sequence[tuple[int, dict]]]
+
+
+def drain(buffer: io.StringIO | io.BytesIO) -> Any:
+    data = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return data
+
+
+def pivot(
+    questions: list[Question], partition: Sequence[tuple[int, dict]]
+) -> tuple[list[int], list[list[Any]]]:
+    index = {str(question.id): i for i, question in enumerate(questions)}
+    ids = []
+    columns: list[list[Any]] = [[None] * len(partition) for _ in questions]
+
+    for row, (answer_id, data) in enumerate(partition):
+        ids.append(answer_id)
+        for value in data["values"]:
+            column = index.get(value["question_id"])
+            if column is None:
+                continue
+            if value["question_type"] == QuestionType.selector:
+                columns[column][row] = value["values"]
+            else:
+                columns[column][row] = value["value"]
+
+    return ids, columns
+
+
+async def encode_csv(
+    questions: list[Question], partitions: Partitions
+) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(["id", *(question.label for question in questions)])
+    yield drain(buffer)
+
+    selectors = [
+        i
+        for i, question in enumerate(questions)
+        if question.question_type == QuestionType.selector
+    ]
+    async for partition in partitions:
+        ids, columns = pivot(questions, partition)
+        for i in selectors:
+            columns[i] = [
+                None if values is None else ";".join(map(str, sorted(values)))
+                for values in columns[i]
+            ]
+
+        writer.writerows(zip(ids, *columns))
+        yield drain(buffer)
+
+
+async def encode_parquet(
+    questions: list[Question], partitions: Partitions
+) -> AsyncIterator[bytes]:
+    types = {
+        QuestionType.text: pyarrow.string(),
+        QuestionType.selector: pyarrow.list_(pyarrow.int64()),
+        QuestionType.scale: pyarrow.int64(),
+    }
+    schema = pyarrow.schema(
+        [pyarrow.field("id", pyarrow.int64(), nullable=False)]
+        + [
+            pyarrow.field(
+                str(question.id),
+                types[question.question_type],
+                metadata={"label": question.label},
+            )
+            for question in questions
+        ]
+    )
+
+    buffer = io.BytesIO()
+    with pyarrow.parquet.ParquetWriter(buffer, schema) as writer:
+        async for partition in partitions:
+            ids, columns = pivot(questions, partition)
+            writer.write_batch(pyarrow.record_batch([ids, *columns], schema=schema))
+            yield drain(buffer)
+    yield drain(buffer)
@@ -1,11 +1,28 @@
-from fastapi import APIRouter, HTTPException
-from sqlalchemy import select, delete
+from datetime import timezone
+from email.utils import format_datetime
+from typing import Annotated
 
-import database
-from models import FormData, Form
-from .utils import User
+from fastapi import APIRouter, HTTPException, Header, Query, Response
+from sqlalchemy import and_, func, select
 
-router = APIRouter(prefix="/form")
+import database
+from utils import TimedRoute
+from database.counter import ANSWERED, RESPONSES, ResultCounter, reset_counters
+from database.form import add_version
+from models import FormData, Form, FormSummary
+from .live import live_results
+from .utils import (
+    User,
+    etag_matches,
+    form_etag,
+    form_responses,
+    invalidate_form,
+    modified_since,
+    pin_primary,
+    reader,
+)
+
+router = APIRouter(prefix="/form", route_class=TimedRoute)
 
 
 @router.post("/create")
@@ -17,15 +34,23 @@ async def create_form(user: User, form_data: FormData) -> Form:
 
         session.add(form)
         await session.flush()
-        await session.refresh(form)
+        await add_version(session, form, form.data)
+
+        form_model = Form.model_validate(form)
 
-        return Form.model_validate(form)
+    await pin_primary(f"user:{user.id}", f"form:{form_model.id}")
+
+    return form_model
 
 
 @router.put("/edit")
 async def edit_form(user: User, id: int, form_data: FormData) -> Form:
     async with database.sessions.begin() as session:
-        stmt = select(database.Form).where(database.Form.id == id)
+        stmt = (
+            select(database.Form)
+            .where(database.Form.id == id, database.Form.deleted_at.is_(None))
+            .with_for_update(key_share=True)
+        )
         db_request = await session.execute(stmt)
         form = db_request.scalar_one_or_none()
 
@@ -34,21 +59,28 @@ async def edit_form(user: User, id: int, form_data: FormData) -> Form:
         if form.owner_id != user.id:
             raise HTTPException(403, "Forbidden")
 
+        # Answers to the previous version are hidden from now on and deleted
+        # in the background by the reaper, so editing does not depend on how
+        # many answers the form has.
         form.name = form_data.name
-        form.data = form_data.model_dump()
+        await add_version(session, form, form_data.model_dump())
+        await reset_counters(session, id)
 
-        await session.flush()
+        form_model = Form.model_validate(form)
 
-        stmt = delete(database.Answer).where(database.Answer.form_id == id)
-        await session.execute(stmt)
+    live_results.touch(id)
+    await pin_primary(f"user:{user.id}", f"form:{id}")
+    await invalidate_form(id)
 
-        return Form.model_validate(form)
+    return form_model
 
 
 @router.delete("/delete")
 async def delete_form(user: User, id: int):
     async with database.sessions.begin() as session:
-        stmt = select(database.Form).where(database.Form.id == id)
+        stmt = select(database.Form).where(
+            database.Form.id == id, database.Form.deleted_at.is_(None)
+        )
         db_request = await session.execute(stmt)
         form = db_request.scalar_one_or_none()
 
@@ -57,28 +89,95 @@ async def delete_form(user: User, id: int):
         if form.owner_id != user.id:
             raise HTTPException(403, "Forbidden")
 
-        await session.delete(form)
+        # Hidden from now on; the reaper deletes the answers in chunks and
+        # then the form itself.
+        form.deleted_at = func.now()
+
+    await pin_primary(f"user:{user.id}", f"form:{id}")
+    await invalidate_form(id)
 
 
+# Summaries only: the full form is fetched through /form/get when needed.
 @router.get("/list")
-async def user_forms(user: User):
-    async with database.sessions.begin() as session:
-        return {
-            "forms": [
-                Form.model_validate(item)
-                for item in await session.scalars(
-                    select(database.Form).where(database.Form.owner_id == user.id)
-                )
-            ]
-        }
+async def user_forms(
+    user: User,
+    after: int | None = None,
+    limit: Annotated[int, Query(ge=1, le=1000)] = 100,
+):
+    stmt = (
+        select(
+            database.Form.id,
+            database.Form.name,
+            func.coalesce(ResultCounter.count, 0).label("answers"),
+            database.Form.updated_at,
+        )
+        .outerjoin(
+            ResultCounter,
+            and_(
+                ResultCounter.form_id == database.Form.id,
+                ResultCounter.question_id == RESPONSES,
+                ResultCounter.key == ANSWERED,
+            ),
+        )
+        .where(database.Form.owner_id == user.id, database.Form.deleted_at.is_(None))
+        .order_by(database.Form.id)
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(database.Form.id > after)
+
+    async with reader(f"user:{user.id}").begin() as session:
+        forms = [FormSummary.model_validate(row) for row in await session.execute(stmt)]
+
+    return {
+        "forms": forms,
+        "next": forms[-1].id if len(forms) == limit else None,
+    }
 
 
 @router.get("/get")
-async def get_form(id: int) -> Form | None:
-    async with database.sessions.begin() as session:
-        stmt = select(database.Form).where(database.Form.id == id)
-        db_request = await session.execute(stmt)
-        form = db_request.scalar_one_or_none()
+async def get_form(
+    id: int,
+    if_none_match: Annotated[str | None, Header()] = None,
+    if_modified_since: Annotated[str | None, Header()] = None,
+) -> Form | None:
+    cached = form_responses.get(id)
+    if cached is None:
+        generation = form_responses.generation
+        async with reader(f"form:{id}").begin() as session:
+            stmt = select(database.Form.data, database.Form.updated_at).where(
+                database.Form.id == id, database.Form.deleted_at.is_(None)
+            )
+            form = (await session.execute(stmt)).one_or_none()
+
+        if form is None:
+            return None
+
+        # HTTP dates have whole seconds. SQLite returns naive UTC datetimes.
+        updated_at = form.updated_at
+        if updated_at is not None:
+            if updated_at.tzinfo is None:
+                updated_at = updated_at.replace(tzinfo=timezone.utc)
+            updated_at = updated_at.astimezone(timezone.utc).replace(microsecond=0)
+
+        body = Form.model_validate({"id": id, "data": form.data}).model_dump_json()
+        cached = (body.encode("utf-8"), form_etag(form.data), updated_at)
+        if form_responses.generation == generation:
+            form_responses.set(id, cached)
+
+    body, etag, updated_at = cached
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if updated_at is not None:
+        headers["Last-Modified"] = format_datetime(updated_at, usegmt=True)
+
+    # If-Modified-Since only applies without If-None-Match.
+    if if_none_match is not None:
+        not_modified = etag_matches(if_none_match, etag)
+    else:
+        not_modified = updated_at is not None and not modified_since(
+            if_modified_since, updated_at
+        )
+    if not_modified:
+        return Response(status_code=304, headers=headers)
 
-        if form is not None:
-            return Form.model_validate(form)
+    return Response(body, media_type="application/json", headers=headers)
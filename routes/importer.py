@@ -0,0 +1,186 @@
+import codecs
+import csv
+from typing import AsyncIterator
+
+from pydantic import ValidationError
+
+from models import AnswerData, Question, QuestionType
+
+# Each row is either parsed answer data or the error that prevented parsing.
+Rows = AsyncIterator[tuple[int, AnswerData | str]]
+
+
+async def lines(chunks: AsyncIterator[bytes], limit: int) -> AsyncIterator[str | None]:
+    # Only the new text is searched for line breaks. A line longer than limit
+    # characters is dropped as it arrives and comes out as None.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    parts: list[str] = []
+    size = 0
+
+    async for chunk in chunks:
+        text = decoder.decode(chunk)
+        start = 0
+        while (end := text.find("\n", start)) >= 0:
+            size += end - start
+            if size <= limit:
+                parts.append(text[start:end])
+                yield "".join(parts)
+            else:
+                yield None
+            parts, size = [], 0
+            start = end + 1
+
+        size += len(text) - start
+        if size <= limit:
+            parts.append(text[start:])
+        else:
+            parts = []
+
+    text = decoder.decode(b"", final=True)
+    size += len(text)
+    if size > limit:
+        yield None
+    elif size:
+        yield "".join(parts) + text
+
+
+def describe(error: ValidationError) -> str:
+    return "; ".join(
+        (
+            f"{'.'.join(map(str, item['loc']))}: {item['msg']}"
+            if item["loc"]
+            else item["msg"]
+        )
+        for item in error.errors()
+    )
+
+
+async def parse_ndjson(chunks: AsyncIterator[bytes], limit: int) -> Rows:
+    number = 0
+    async for line in lines(chunks, limit):
+        number += 1
+        if line is None:
+            yield number, f"The row is longer than {limit} characters"
+            continue
+        if not line.strip():
+            continue
+        try:
+            yield number, AnswerData.model_validate_json(line)
+        except ValidationError as e:
+            yield number, describe(e)
+
+
+def ends_quoted(line: str, quoted: bool) -> bool:
+    # Whether the line ends inside a quoted field, given whether it starts in
+    # one, following the csv module's default dialect: a field is quoted only
+    # if it starts with a quote, and a doubled quote inside it is escaped.
+    position = 0
+    while True:
+        if quoted:
+            end = line.find('"', position)
+            if end < 0:
+                return True
+            if line.startswith('"', end + 1):
+                position = end + 2
+                continue
+            quoted = False
+            position = end + 1
+        elif line.startswith('"', position):
+            quoted = True
+            position += 1
+            continue
+
+        delimiter = line.find(",", position)
+        if delimiter < 0:
+            return False
+        position = delimiter + 1
+
+
+def parse_record(record: str) -> list[str] | str:
+    try:
+        return next(csv.reader([record]), [])
+    except csv.Error as e:
+        return f"Invalid CSV: {e}"
+
+
+async def records(
+    chunks: AsyncIterator[bytes], limit: int
+) -> AsyncIterator[list[str] | str]:
+    # Records are yielded parsed, or as the error that prevented parsing. A
+    # record over the limit is reported and parsing picks up again at the
+    # next line, so an unbalanced quote cannot swallow the rest of the upload.
+    pending: list[str] = []
+    size = 0
+    quoted = False
+    async for line in lines(chunks, limit):
+        size += len(line) + 1 if line is not None else limit + 1
+        if size > limit:
+            yield f"The row is longer than {limit} characters"
+            pending, size, quoted = [], 0, False
+            continue
+
+        pending.append(line)
+        quoted = ends_quoted(line, quoted)
+        if not quoted:
+            yield parse_record("\n".join(pending).rstrip("\r"))
+            pending, size = [], 0
+
+    if pending:
+        yield "Invalid CSV: unexpected end of data"
+
+
+def csv_columns(questions: list[Question], header: list[str]) -> list[Question | None]:
+    # Columns are matched by question id, or by label as written by the CSV
+    # export. The export's leading "id" column is ignored.
+    by_id = {str(question.id): question for question in questions}
+    by_label = {question.label: question for question in questions}
+
+    columns: list[Question | None] = []
+    for name in header:
+        question = by_id.get(name) or by_label.get(name)
+        if question is None and name != "id":
+            raise ValueError(f"Unknown column {name!r}")
+        columns.append(question)
+    return columns
+
+
+def csv_value(question: Question, cell: str) -> dict:
+    value: dict = {"question_id": question.id, "question_type": question.question_type}
+    if question.question_type == QuestionType.selector:
+        value["values"] = [int(option) for option in cell.split(";")]
+    elif question.question_type == QuestionType.scale:
+        value["value"] = int(cell)
+    else:
+        value["value"] = cell
+    return value
+
+
+async def parse_csv(
+    columns: list[Question | None], records: AsyncIterator[list[str] | str]
+) -> Rows:
+    number = 1
+    async for record in records:
+        number += 1
+        if isinstance(record, str):
+            yield number, record
+            continue
+        if not any(record):
+            continue
+        if len(record) != len(columns):
+            yield number, f"Expected {len(columns)} columns, got {len(record)}"
+            continue
+
+        try:
+            values = [
+                csv_value(question, cell)
+                for question, cell in zip(columns, record)
+                if question is not None and cell != ""
+            ]
+        except ValueError:
+            yield number, "Selector and scale values must be integers"
+            continue
+
+        try:
+            yield number, AnswerData.model_validate({"values": values})
+        except ValidationError as e:
+            yield number, describe(e)
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+from collections import Counter
+
+import database
+from database.counter import Key, read_counters
+from models import settings
+from utils import Broker
+from .utils import IDS_PER_MESSAGE, broker
+
+
+class Subscription:
+    __slots__ = ("pending", "ready", "closed")
+
+    def __init__(self) -> None:
+        self.pending: Counter[Key] = Counter()
+        self.ready = asyncio.Event()
+        self.closed = False
+
+    def push(self, delta: dict[Key, int]) -> None:
+        # A subscriber that has not caught up gets the deltas merged into
+        # one instead of queued up.
+        self.pending.update(delta)
+        self.ready.set()
+
+    def close(self) -> None:
+        self.closed = True
+        self.ready.set()
+
+    async def next(self) -> Counter[Key] | None:
+        await self.ready.wait()
+        self.ready.clear()
+        if self.closed:
+            return None
+
+        delta, self.pending = self.pending, Counter()
+        return Counter({key: count for key, count in delta.items() if count})
+
+
+# Pushes changes of result counters to subscribed owners. Commits are only
+# noted as they happen; once per interval each worker announces the forms
+# it has written to, and the workers with subscribers to those forms read
+# their counters once and send every subscriber the difference. A viewer
+# thus gets at most one message per interval, however busy the form is.
+class LiveResults:
+    def __init__(self, broker: Broker, interval: float) -> None:
+        self.broker = broker
+        self.interval = interval
+        self.subscriptions: dict[int, set[Subscription]] = {}
+        self.counts: dict[int, Counter[Key]] = {}
+        self.written: set[int] = set()
+        self.changed: set[int] = set()
+        self.closed = False
+        self._task: asyncio.Task | None = None
+
+        broker.subscribe("answers", self.on_message)
+        broker.subscribe(Broker.RESET, self.on_reset)
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+
+        task, self._task = self._task, None
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        await self.announce()
+        self.close()
+
+    def close(self) -> None:
+        # Ends the streams, which the server would otherwise wait for
+        # before shutting down.
+        self.closed = True
+        for subscriptions in self.subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+
+    def touch(self, form_id: int) -> None:
+        self.written.add(form_id)
+
+    async def subscribe(self, form_id: int) -> tuple[Subscription, Counter[Key]]:
+        subscription = Subscription()
+        if self.closed:
+            subscription.close()
+        self.subscriptions.setdefault(form_id, set()).add(subscription)
+
+        counts = self.counts.get(form_id)
+        if counts is None:
+            async with database.sessions() as session:
+                counts = await read_counters(session, form_id)
+            # Another subscriber may have got there first; deltas are
+            # computed against its snapshot.
+            counts = self.counts.setdefault(form_id, counts)
+        return subscription, counts
+
+    def unsubscribe(self, form_id: int, subscription: Subscription) -> None:
+        subscriptions = self.subscriptions.get(form_id)
+        if subscriptions is None:
+            return
+
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self.subscriptions[form_id]
+            self.counts.pop(form_id, None)
+            self.changed.discard(form_id)
+
+    def on_message(self, message: str) -> None:
+        for form_id in map(int, message.split(",")):
+            if form_id in self.subscriptions:
+                self.changed.add(form_id)
+
+    def on_reset(self, message: str) -> None:
+        # Announcements may have been missed.
+        self.changed.update(self.subscriptions)
+
+    async def announce(self) -> None:
+        written, self.written = sorted(self.written), set()
+        for i in range(0, len(written), IDS_PER_MESSAGE):
+            chunk = written[i : i + IDS_PER_MESSAGE]
+            await self.broker.publish("answers", ",".join(map(str, chunk)))
+
+    async def refresh(self) -> None:
+        changed, self.changed = self.changed, set()
+        for form_id in changed:
+            if form_id not in self.subscriptions:
+                continue
+            if form_id not in self.counts:
+                # The first subscriber is still reading its snapshot.
+                self.changed.add(form_id)
+                continue
+
+            async with database.sessions() as session:
+                counts = await read_counters(session, form_id)
+            if form_id not in self.subscriptions:
+                continue
+
+            previous = self.counts[form_id]
+            delta = {
+                key: counts[key] - previous[key]
+                for key in counts.keys() | previous.keys()
+                if counts[key] != previous[key]
+            }
+            self.counts[form_id] = counts
+            if delta:
+                for subscription in self.subscriptions[form_id]:
+                    subscription.push(delta)
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.announce()
+                await self.refresh()
+            except Exception:
+                logging.exception("Failed to push live results")
+
+
+live_results = LiveResults(broker, settings.LIVE_INTERVAL / 1000)
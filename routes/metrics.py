@@ -0,0 +1,52 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import PlainTextResponse
+
+import database
+from utils import TimedRoute
+from database.metrics import pool_status
+from .utils import Admin, profiler, route_metrics
+
+router = APIRouter(prefix="/metrics", route_class=TimedRoute)
+
+
+@router.get("")
+async def get_metrics(admin_token: Admin):
+    metrics = {
+        "pool": pool_status(database.engine.sync_engine),
+        "routes": route_metrics.snapshot(),
+    }
+    if database.replica_engine is not database.engine:
+        metrics["replica_pool"] = pool_status(database.replica_engine.sync_engine)
+    return metrics
+
+
+@router.get("/prometheus", response_class=PlainTextResponse)
+async def get_prometheus_metrics(admin_token: Admin):
+    pools = {"primary": pool_status(database.engine.sync_engine)}
+    if database.replica_engine is not database.engine:
+        pools["replica"] = pool_status(database.replica_engine.sync_engine)
+
+    lines = []
+    for key in ("size", "checked_out", "overflow", "waiting"):
+        lines.append(f"# TYPE formaptix_db_pool_{key} gauge")
+        for name, status in pools.items():
+            if key in status:
+                lines.append(f'formaptix_db_pool_{key}{{pool="{name}"}} {status[key]}')
+    lines += profiler.exposition()
+    return "\n".join(lines) + "\n"
+
+
+@router.get("/profiles")
+async def list_profiles(admin_token: Admin):
+    return [
+        {key: value for key, value in profile.items() if key != "folded"}
+        for profile in reversed(profiler.profiles)
+    ]
+
+
+@router.get("/profiles/{id}", response_class=PlainTextResponse)
+async def get_profile(id: int, admin_token: Admin):
+    profile = profiler.get_profile(id)
+    if profile is None:
+        raise HTTPException(404, "Profile not found")
+    return profile["folded"]
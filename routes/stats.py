@@ -0,0 +1,174 @@
+from collections import Counter
+from itertools import chain
+
+from sqlalchemy import Integer, String, bindparam, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import database
+from database.counter import (
+    ANSWERED,
+    RESPONSES,
+    Key,
+    answer_keys,
+    reset_counters,
+    update_counters,
+)
+from models import Question, QuestionType
+
+POSTGRES_COUNTS = text(
+    """
+    SELECT :responses, :answered, count(*)
+    FROM answers
+    WHERE answers.version_id = (SELECT version_id FROM forms WHERE id = :form_id)
+    UNION ALL
+    SELECT v ->> 'question_id', k.key, count(*)
+    FROM answers
+    CROSS JOIN jsonb_array_elements(answers.data::jsonb -> 'values') AS v
+    CROSS JOIN LATERAL (
+        SELECT :answered
+        UNION ALL
+        SELECT length(v ->> 'value') WHERE v ->> 'question_type' = '1'
+        UNION ALL
+        SELECT (v ->> 'value')::integer WHERE v ->> 'question_type' = '3'
+        UNION ALL
+        SELECT o::integer
+        FROM jsonb_array_elements_text(v -> 'values') AS o
+        WHERE v ->> 'question_type' = '2' AND o::integer >= 0
+    ) AS k(key)
+    WHERE answers.version_id = (SELECT version_id FROM forms WHERE id = :form_id)
+    GROUP BY 1, 2
+    """
+).bindparams(
+    bindparam("responses", RESPONSES, type_=String),
+    bindparam("answered", ANSWERED, type_=Integer),
+)
+
+SQLITE_COUNTS = text(
+    """
+    WITH v(question_id, question_type, value) AS (
+        SELECT json_extract(v.value, '$.question_id'),
+            json_extract(v.value, '$.question_type'), v.value
+        FROM answers, json_each(answers.data, '$.values') AS v
+        WHERE answers.version_id = (SELECT version_id FROM forms WHERE id = :form_id)
+    )
+    SELECT :responses, :answered, count(*)
+    FROM answers
+    WHERE answers.version_id = (SELECT version_id FROM forms WHERE id = :form_id)
+    UNION ALL
+    SELECT question_id, key, count(*)
+    FROM (
+        SELECT question_id, :answered AS key FROM v
+        UNION ALL
+        SELECT question_id, length(json_extract(value, '$.value'))
+        FROM v WHERE question_type = 1
+        UNION ALL
+        SELECT question_id, json_extract(value, '$.value')
+        FROM v WHERE question_type = 3
+        UNION ALL
+        SELECT question_id, o.value
+        FROM v, json_each(v.value, '$.values') AS o
+        WHERE question_type = 2 AND o.value >= 0
+    )
+    GROUP BY 1, 2
+    """
+).bindparams(
+    bindparam("responses", RESPONSES, type_=String),
+    bindparam("answered", ANSWERED, type_=Integer),
+)
+
+COUNTS = {"postgresql": POSTGRES_COUNTS, "sqlite": SQLITE_COUNTS}
+
+
+async def count_answers(session: AsyncSession, form_id: int) -> Counter[Key]:
+    dialect = session.bind.dialect.name
+    if dialect in COUNTS:
+        db_request = await session.execute(COUNTS[dialect], {"form_id": form_id})
+        return Counter(
+            {(question_id, key): count for question_id, key, count in db_request}
+        )
+
+    # Backends without JSON functions count in one streamed pass in Python.
+    counts: Counter[Key] = Counter()
+    version = select(database.Form.version_id).where(database.Form.id == form_id)
+    stmt = (
+        select(database.Answer.data)
+        .where(database.Answer.version_id == version.scalar_subquery())
+        .execution_options(yield_per=1000)
+    )
+    result = await session.stream_scalars(stmt)
+    async for partition in result.partitions():
+        counts.update(chain.from_iterable(map(answer_keys, partition)))
+    return counts
+
+
+async def rebuild_counters(session: AsyncSession, form_id: int) -> None:
+    await reset_counters(session, form_id)
+    await update_counters(session, form_id, await count_answers(session, form_id))
+
+
+def percentile(histogram: dict[int, int], q: float) -> float | None:
+    total = sum(histogram.values())
+    if total == 0:
+        return None
+
+    def value_at(position: int) -> int:
+        seen = 0
+        for key in sorted(histogram):
+            seen += histogram[key]
+            if seen > position:
+                return key
+        return key
+
+    rank = q * (total - 1)
+    lower = value_at(int(rank))
+    upper = value_at(min(int(rank) + 1, total - 1))
+    return lower + (upper - lower) * (rank - int(rank))
+
+
+def summarize(questions: list[Question], counts: Counter[Key]) -> dict:
+    responses = counts.get((RESPONSES, ANSWERED), 0)
+    histograms: dict[str, dict[int, int]] = {}
+    for (question_id, key), count in counts.items():
+        if key != ANSWERED:
+            histograms.setdefault(question_id, {})[key] = count
+
+    summaries = []
+    for question in questions:
+        question_id = str(question.id)
+        answered = counts.get((question_id, ANSWERED), 0)
+        histogram = histograms.get(question_id, {})
+        summary = {
+            "id": question_id,
+            "question_type": question.question_type,
+            "required": question.required,
+            "answered": answered,
+            "completion_rate": answered / responses if responses else None,
+        }
+
+        if question.question_type == QuestionType.selector:
+            summary["options"] = {
+                option: histogram.get(option, 0)
+                for option in sorted(set(range(len(question.options))) | set(histogram))
+            }
+        elif question.question_type == QuestionType.scale:
+            total = sum(histogram.values())
+            summary["distribution"] = {
+                value: histogram.get(value, 0)
+                for value in range(question.min_value, question.max_value + 1)
+            }
+            summary["mean"] = (
+                sum(value * count for value, count in histogram.items()) / total
+                if total
+                else None
+            )
+            summary["median"] = percentile(histogram, 0.5)
+        elif question.question_type == QuestionType.text:
+            summary["length_percentiles"] = {
+                "p50": percentile(histogram, 0.5),
+                "p90": percentile(histogram, 0.9),
+                "p99": percentile(histogram, 0.99),
+            }
+
+        summaries.append(summary)
+
+    return {"responses": responses, "questions": summaries}
@@ -2,38 +2,57 @@ import secrets
 
 import jwt
 from fastapi import APIRouter, HTTPException
-from sqlalchemy import select
+from sqlalchemy import select, update
 
 import database
+from utils import TimedRoute
 import models
 from models import settings
-from .utils import hash_password, User
+from .utils import passwords, forget_user, pin_primary, User
 
-router = APIRouter(prefix="/user")
+router = APIRouter(prefix="/user", route_class=TimedRoute)
+
+# Checked against for unknown usernames, so that they take as long to reject
+# as a wrong password and cannot be told apart by the response time.
+DUMMY_SALT = "0" * 16
+DUMMY_HASH = f"{passwords.hasher.scheme}${passwords.hasher.cost}$"
 
 
 @router.post("/login")
 async def login(auth: models.Auth) -> models.Token:
-    async with database.sessions.begin() as session:
+    async with database.sessions() as session:
         stmt = select(database.User).where(
-            database.User.username == auth.username.strip()
+            database.User.username == auth.username.strip(),
+            database.User.deleted_at.is_(None),
         )
         request = await session.execute(stmt)
         user = request.scalar_one_or_none()
 
-        if (
-            user is None
-            or hash_password(auth.password.strip(), user.salt) != user.password
-        ):
-            raise HTTPException(403, "Forbidden")
-
-        return models.Token(
-            id=user.id,
-            username=user.username,
-            token=jwt.encode(
-                {"sub": user.id}, settings.SECRET + user.password, "HS256"
-            ),
-        )
+    if user is None:
+        await passwords.verify(auth.password.strip(), DUMMY_SALT, DUMMY_HASH)
+        raise HTTPException(403, "Forbidden")
+    if not await passwords.verify(auth.password.strip(), user.salt, user.password):
+        raise HTTPException(403, "Forbidden")
+
+    # The account may be newer than what the replica has seen so far.
+    await pin_primary(f"user:{user.id}")
+
+    if passwords.needs_rehash(user.password):
+        user.password = await passwords.hash(auth.password.strip(), user.salt)
+        async with database.sessions.begin() as session:
+            stmt = (
+                update(database.User)
+                .where(database.User.id == user.id)
+                .values(password=user.password)
+            )
+            await session.execute(stmt)
+        await forget_user(user.id)
+
+    return models.Token(
+        id=user.id,
+        username=user.username,
+        token=jwt.encode({"sub": user.id}, settings.SECRET + user.password, "HS256"),
+    )
 
 
 @router.post("/get")
@@ -46,7 +65,15 @@ async def update_password(user: User, new: models.UpdatePassword):
     if len(new.password.strip()) == 0:
         raise HTTPException(400, "Password must not be empty")
 
+    salt = secrets.token_hex(8)
+    password = await passwords.hash(new.password.strip(), salt)
     async with database.sessions.begin() as session:
-        session.add(user)
-        user.salt = secrets.token_hex(8)
-        user.password = hash_password(new.password.strip(), user.salt)
+        stmt = (
+            update(database.User)
+            .where(database.User.id == user.id)
+            .values(salt=salt, password=password)
+        )
+        await session.execute(stmt)
+
+    await pin_primary(f"user:{user.id}")
+    await forget_user(user.id)
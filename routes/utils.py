@@ -1,16 +1,89 @@
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from typing import Annotated
 import hashlib
+import json
 
 import jwt
-from fastapi import Depends, HTTPException, Header
-from sqlalchemy import select
+from fastapi import Depends, HTTPException, Header, Query
+from sqlalchemy import make_url, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from models import settings
+from models import settings, FormData, CompiledForm
+from utils import (
+    HASHERS,
+    Broker,
+    CacheBackend,
+    LocalBroker,
+    LRUCache,
+    MemoryBackend,
+    Passwords,
+    PostgresBroker,
+    RouteMetrics,
+    SizedLRUCache,
+    Profiler,
+    span,
+)
 import database
 
+passwords = Passwords(
+    HASHERS[settings.PASSWORD_HASHER](settings.PASSWORD_HASH_COST),
+    settings.PASSWORD_HASH_WORKERS,
+)
 
-def hash_password(password: str, salt: str) -> str:
-    return hashlib.sha512((password + salt).encode("utf-8")).hexdigest()
+
+def create_broker() -> Broker:
+    url = make_url(settings.DATABASE)
+    if settings.BROKER == "postgres" or (
+        settings.BROKER == "auto" and url.get_backend_name() == "postgresql"
+    ):
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(dsn)
+    return LocalBroker()
+
+
+broker: Broker = create_broker()
+route_metrics = RouteMetrics()
+profiler = Profiler(settings.PROFILE_KEEP)
+compiled_forms = LRUCache(settings.FORM_CACHE_SIZE)
+form_responses = SizedLRUCache(
+    settings.FORM_RESPONSE_CACHE_SIZE, lambda entry: len(entry[0])
+)
+verified_tokens = LRUCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL)
+user_cache: CacheBackend = MemoryBackend(
+    settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL
+)
+replica_pins = LRUCache(settings.USER_CACHE_SIZE, settings.REPLICA_PIN_TTL)
+
+# Messages carry comma separated ids or keys; NOTIFY payloads are limited to
+# 8000 bytes.
+IDS_PER_MESSAGE = 500
+
+
+async def publish_all(channel: str, items: list[str]) -> None:
+    for i in range(0, len(items), IDS_PER_MESSAGE):
+        await broker.publish(channel, ",".join(items[i : i + IDS_PER_MESSAGE]))
+
+
+def reader(*keys: str) -> async_sessionmaker[AsyncSession]:
+    # Reads go to the replica unless one of the keys was written to recently,
+    # in which case the replica may not have caught up yet.
+    if any(key in replica_pins for key in keys):
+        return database.sessions
+    return database.read_sessions
+
+
+def remember_pins(message: str) -> None:
+    for key in message.split(","):
+        replica_pins.set(key, True)
+
+
+broker.subscribe("pins", remember_pins)
+
+
+async def pin_primary(*keys: str) -> None:
+    if database.read_sessions is not database.sessions:
+        await publish_all("pins", list(keys))
 
 
 def verify_admin(password: Annotated[str, Header(alias="x-token")]):
@@ -19,33 +92,174 @@ def verify_admin(password: Annotated[str, Header(alias="x-token")]):
     return True
 
 
-async def verify_user(token: Annotated[str, Header(alias="x-token")]) -> database.User:
-    try:
-        data = jwt.decode(
-            token, algorithms=["HS256"], options={"verify_signature": False}
+async def get_user(user_id: int) -> database.User | None:
+    cached = await user_cache.get(f"user:{user_id}")
+    if cached is not None:
+        username, password = cached
+        return database.User(id=user_id, username=username, password=password)
+
+    async with reader(f"user:{user_id}")() as session:
+        stmt = select(database.User.username, database.User.password).where(
+            database.User.id == user_id, database.User.deleted_at.is_(None)
         )
-    except jwt.exceptions.DecodeError:
-        raise HTTPException(401, "Invalid token")
+        db_request = await session.execute(stmt)
+        row = db_request.one_or_none()
+
+    if row is None:
+        return None
+
+    await user_cache.set(f"user:{user_id}", (row.username, row.password))
+    return database.User(id=user_id, username=row.username, password=row.password)
+
+
+async def forget_user(user_id: int) -> None:
+    await user_cache.delete(f"user:{user_id}")
+    await broker.publish("users", str(user_id))
+
 
-    if "sub" not in data and not isinstance(data["sub"], int):
+async def drop_user(message: str) -> None:
+    await user_cache.delete(f"user:{message}")
+
+
+broker.subscribe("users", drop_user)
+
+
+async def verify_user(token: Annotated[str, Header(alias="x-token")]) -> database.User:
+    with span("auth"):
+        return await _verify_user(token)
+
+
+# EventSource cannot set headers, so streams also accept the token as a query
+# parameter.
+async def verify_stream_user(
+    x_token: Annotated[str | None, Header(alias="x-token")] = None,
+    token: Annotated[str | None, Query()] = None,
+) -> database.User:
+    token = x_token or token
+    if token is None:
         raise HTTPException(401, "Invalid token")
+    with span("auth"):
+        return await _verify_user(token)
 
-    async with database.sessions.begin() as session:
-        stmt = select(database.User).where(database.User.id == data.get("sub"))
-        db_request = await session.execute(stmt)
-        user = db_request.scalar_one_or_none()
 
-        if user is None:
+async def _verify_user(token: str) -> database.User:
+    verified = verified_tokens.get(token)
+    if verified is not None:
+        user_id, password = verified
+    else:
+        try:
+            data = jwt.decode(
+                token, algorithms=["HS256"], options={"verify_signature": False}
+            )
+        except jwt.exceptions.DecodeError:
+            raise HTTPException(401, "Invalid token")
+
+        if not isinstance(data.get("sub"), int):
             raise HTTPException(401, "Invalid token")
+        user_id, password = data["sub"], None
+
+    user = await get_user(user_id)
+    if user is None:
+        raise HTTPException(401, "Invalid token")
 
+    if password is None:
         try:
             jwt.decode(token, settings.SECRET + user.password, algorithms=["HS256"])
         except jwt.exceptions.InvalidSignatureError:
             raise HTTPException(401, "Invalid token")
+        verified_tokens.set(token, (user.id, user.password))
+    elif password != user.password:
+        raise HTTPException(401, "Invalid token")
+
+    return user
+
+
+def form_etag(form_data: dict) -> str:
+    content = json.dumps(form_data, sort_keys=True, separators=(",", ":"))
+    return f'"{hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(",")
+    )
+
+
+def modified_since(if_modified_since: str | None, last_modified: datetime) -> bool:
+    if if_modified_since is None:
+        return True
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return True
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return last_modified > since
+
+
+async def get_owned_form(
+    session: AsyncSession, user: database.User, form_id: int
+) -> database.Form:
+    stmt = select(database.Form).where(
+        database.Form.id == form_id, database.Form.deleted_at.is_(None)
+    )
+    db_request = await session.execute(stmt)
+    form = db_request.scalar_one_or_none()
+
+    if form is None:
+        raise HTTPException(404, "Form not found")
+    if form.owner_id != user.id:
+        raise HTTPException(403, "Forbidden")
+    return form
+
+
+def forget_form(message: str) -> None:
+    for form_id in map(int, message.split(",")):
+        compiled_forms.invalidate(form_id)
+        form_responses.invalidate(form_id)
+
+
+broker.subscribe("forms", forget_form)
+
+
+async def reset_caches(message: str) -> None:
+    compiled_forms.clear()
+    form_responses.clear()
+    verified_tokens.clear()
+    await user_cache.clear()
+
+
+broker.subscribe(Broker.RESET, reset_caches)
+
+
+async def invalidate_form(*form_ids: int) -> None:
+    await publish_all("forms", [str(form_id) for form_id in form_ids])
+
+
+async def get_compiled_form(form_id: int) -> CompiledForm | None:
+    compiled = compiled_forms.get(form_id)
+    if compiled is not None:
+        return compiled
+
+    generation = compiled_forms.generation
+    async with reader(f"form:{form_id}")() as session:
+        stmt = select(database.Form.data, database.Form.version_id).where(
+            database.Form.id == form_id, database.Form.deleted_at.is_(None)
+        )
+        form = (await session.execute(stmt)).one_or_none()
+    if form is None:
+        return None
 
-        session.expunge(user)
-        return user
+    compiled = CompiledForm(FormData.model_validate(form.data), form.version_id)
+    if compiled_forms.generation == generation:
+        compiled_forms.set(form_id, compiled)
+    return compiled
 
 
 User = Annotated[database.User, Depends(verify_user, use_cache=False)]
+StreamUser = Annotated[database.User, Depends(verify_stream_user, use_cache=False)]
 Admin = Annotated[bool, Depends(verify_admin, use_cache=False)]
@@ -0,0 +1,17 @@
+from fastapi import APIRouter
+from starlette.concurrency import run_in_threadpool
+
+from models import IdentifierBatch, IdentifierResults
+from utils import TimedRoute, validate_snilses, validate_tins
+from .utils import User
+
+router = APIRouter(prefix="/validate", route_class=TimedRoute)
+
+
+@router.post("/identifiers")
+async def validate_identifiers(user: User, batch: IdentifierBatch) -> IdentifierResults:
+    # Large batches would stall the event loop for every other request.
+    return IdentifierResults(
+        tin=await run_in_threadpool(validate_tins, batch.tin),
+        snils=await run_in_threadpool(validate_snilses, batch.snils),
+    )
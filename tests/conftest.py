@@ -0,0 +1,24 @@
+import os
+import tempfile
+from typing import Iterator
+
+import pytest
+
+DIRECTORY = tempfile.mkdtemp()
+
+os.environ.update(
+    DATABASE=f"sqlite+aiosqlite:///{DIRECTORY}/formaptix.sqlite",
+    SECRET="secret",
+    PORT="8080",
+    ADMIN_PASSWORD="admin",
+)
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import main  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client() -> Iterator[TestClient]:
+    with TestClient(main.create_app()) as client:
+        yield client
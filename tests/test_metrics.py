@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+
+
+def test_prometheus_is_plain_text(client: TestClient) -> None:
+    response = client.get("/metrics/prometheus", headers={"x-token": "admin"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert response.text.startswith("# TYPE formaptix_db_pool_size gauge\n")
+
+
+def test_metrics_is_json(client: TestClient) -> None:
+    response = client.get("/metrics", headers={"x-token": "admin"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert "pool" in response.json()
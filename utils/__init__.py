@@ -1 +1,7 @@
 from .validator import *
+from .cache import LRUCache, SizedLRUCache, CacheBackend, MemoryBackend
+from .password import HASHERS, PasswordHasher, Passwords
+from .pubsub import Broker, LocalBroker, PostgresBroker
+from .metrics import MetricsMiddleware, RouteMetrics
+from .responses import JSONResponse, JSONRoute, UploadStreamingResponse
+from .profiling import Profiler, ProfilingMiddleware, TimedRoute, span
@@ -0,0 +1,123 @@
+import abc
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        # Bumped on every invalidation, so that a reader can tell whether the
+        # value it loaded may have gone stale before it got to store it.
+        self.generation = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, self) is not self
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        try:
+            expires, value = self._data[key]
+        except KeyError:
+            return default
+
+        if self.ttl is not None and expires < time.monotonic():
+            del self._data[key]
+            return default
+
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+
+        expires = time.monotonic() + self.ttl if self.ttl is not None else 0
+        self._data[key] = (expires, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        value = self.get(key, default)
+        self._data.pop(key, None)
+        return value
+
+    def invalidate(self, key: Hashable) -> None:
+        self.pop(key)
+        self.generation += 1
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.generation += 1
+
+
+class SizedLRUCache(LRUCache):
+    def __init__(self, maxsize: int, sizeof: Callable[[Any], int] = len) -> None:
+        super().__init__(maxsize)
+        self.sizeof = sizeof
+        self.size = 0
+
+    def set(self, key: Hashable, value: Any) -> None:
+        self.pop(key)
+
+        size = self.sizeof(value)
+        if size > self.maxsize:
+            return
+
+        self._data[key] = (0, value)
+        self.size += size
+        while self.size > self.maxsize:
+            _, (_, evicted) = self._data.popitem(last=False)
+            self.size -= self.sizeof(evicted)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        if item is None:
+            return default
+
+        self.size -= self.sizeof(item[1])
+        return item[1]
+
+    def clear(self) -> None:
+        super().clear()
+        self.size = 0
+
+
+class CacheBackend(abc.ABC):
+    @abc.abstractmethod
+    async def get(self, key: str) -> Any:
+        pass
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: Any) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def delete(self, key: str) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def clear(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    def __init__(self, maxsize: int, ttl: float | None = None) -> None:
+        self._cache = LRUCache(maxsize, ttl)
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,106 @@
+import time
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+class Timing:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "total_ms": self.total * 1000,
+            "mean_ms": self.total / self.count * 1000 if self.count else None,
+            "max_ms": self.max * 1000,
+        }
+
+
+class RequestStats:
+    __slots__ = ("db_time", "queries", "pool_wait")
+
+    def __init__(self) -> None:
+        self.db_time = 0.0
+        self.queries = 0
+        self.pool_wait = 0.0
+
+
+# Set for the duration of each HTTP request, so that database hooks deep in
+# the call stack can attribute their time to the route being served.
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None
+)
+
+
+class RouteStats:
+    __slots__ = ("duration", "db_time", "pool_wait", "queries")
+
+    def __init__(self) -> None:
+        self.duration = Timing()
+        self.db_time = Timing()
+        self.pool_wait = Timing()
+        self.queries = 0
+
+    def snapshot(self) -> dict:
+        return {
+            "duration": self.duration.snapshot(),
+            "db_time": self.db_time.snapshot(),
+            "pool_wait": self.pool_wait.snapshot(),
+            "queries": self.queries,
+        }
+
+
+class RouteMetrics:
+    def __init__(self) -> None:
+        self.routes: dict[str, RouteStats] = {}
+
+    def record(self, route: str, duration: float, stats: RequestStats) -> None:
+        route_stats = self.routes.get(route)
+        if route_stats is None:
+            route_stats = self.routes[route] = RouteStats()
+
+        route_stats.duration.add(duration)
+        route_stats.db_time.add(stats.db_time)
+        route_stats.pool_wait.add(stats.pool_wait)
+        route_stats.queries += stats.queries
+
+    def snapshot(self) -> dict:
+        return {route: stats.snapshot() for route, stats in self.routes.items()}
+
+
+# A plain ASGI middleware rather than BaseHTTPMiddleware, so that the time
+# spent producing streamed response bodies is counted as well.
+class MetricsMiddleware:
+    def __init__(self, app: ASGIApp, registry: RouteMetrics) -> None:
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_request.reset(token)
+            # The router stores the matched route in the scope, which keeps
+            # path parameters and unknown paths from splitting the series.
+            route = getattr(scope.get("route"), "path", "unmatched")
+            self.registry.record(
+                f"{scope['method']} {route}", time.perf_counter() - started, stats
+            )
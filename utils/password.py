@@ -0,0 +1,83 @@
+import abc
+import asyncio
+import hashlib
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+
+
+class PasswordHasher(abc.ABC):
+    scheme: str
+    default_cost: int
+
+    def __init__(self, cost: int | None = None) -> None:
+        self.cost = cost if cost is not None else self.default_cost
+
+    @abc.abstractmethod
+    def derive(self, password: str, salt: str, cost: int) -> bytes:
+        pass
+
+
+class ScryptHasher(PasswordHasher):
+    scheme = "scrypt"
+    default_cost = 14  # log2 of the scrypt work factor N
+
+    def derive(self, password: str, salt: str, cost: int) -> bytes:
+        return hashlib.scrypt(
+            password.encode("utf-8"),
+            salt=salt.encode("utf-8"),
+            n=2**cost,
+            r=8,
+            p=1,
+            maxmem=256 * 2**cost * 8,
+            dklen=64,
+        )
+
+
+class PBKDF2Hasher(PasswordHasher):
+    scheme = "pbkdf2"
+    default_cost = 600_000  # iterations
+
+    def derive(self, password: str, salt: str, cost: int) -> bytes:
+        return hashlib.pbkdf2_hmac(
+            "sha512", password.encode("utf-8"), salt.encode("utf-8"), cost
+        )
+
+
+HASHERS: dict[str, type[PasswordHasher]] = {
+    ScryptHasher.scheme: ScryptHasher,
+    PBKDF2Hasher.scheme: PBKDF2Hasher,
+}
+
+
+# Hashes are stored as "scheme$cost$hex". A bare hex digest is the legacy
+# single-round SHA-512, which is still verified but never produced.
+class Passwords:
+    def __init__(self, hasher: PasswordHasher, workers: int) -> None:
+        self.hasher = hasher
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="password")
+
+    async def _derive(
+        self, hasher: PasswordHasher, password: str, salt: str, cost: int
+    ) -> str:
+        key = await asyncio.get_running_loop().run_in_executor(
+            self._executor, hasher.derive, password, salt, cost
+        )
+        return f"{hasher.scheme}${cost}${key.hex()}"
+
+    async def hash(self, password: str, salt: str) -> str:
+        return await self._derive(self.hasher, password, salt, self.hasher.cost)
+
+    async def verify(self, password: str, salt: str, hashed: str) -> bool:
+        scheme, _, rest = hashed.partition("$")
+        if not rest:
+            candidate = hashlib.sha512((password + salt).encode("utf-8")).hexdigest()
+        elif scheme in HASHERS:
+            cost = int(rest.partition("$")[0])
+            candidate = await self._derive(HASHERS[scheme](), password, salt, cost)
+        else:
+            return False
+
+        return hmac.compare_digest(candidate, hashed)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        return not hashed.startswith(f"{self.hasher.scheme}${self.hasher.cost}$")
@@ -0,0 +1,253 @@
+import functools
+import hmac
+import inspect
+import random
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Iterator
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from .metrics import current_request
+from .responses import JSONRoute
+
+
+class Spans(dict[str, float]):
+    __slots__ = ("mark",)
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.mark = time.perf_counter()
+
+    def add(self, name: str, seconds: float) -> None:
+        self[name] = self.get(name, 0.0) + seconds
+
+
+# Only set while profiling is enabled, so that spans cost a single lookup
+# otherwise.
+current_spans: ContextVar[Spans | None] = ContextVar("current_spans", default=None)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    spans = current_spans.get()
+    if spans is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.add(name, time.perf_counter() - started)
+
+
+# Splits the time FastAPI spends on a request into "dependencies" (reading
+# and validating the request, resolving dependencies such as verify_user),
+# "endpoint" and "serialization" of the returned value. Database time is
+# reported separately and overlaps with the first two. Rendering the JSON
+# response counts towards serialization.
+class TimedRoute(JSONRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        if inspect.iscoroutinefunction(endpoint):
+            endpoint = self._wrap(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _wrap(endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(endpoint)
+        async def timed_endpoint(*args: Any, **kwargs: Any) -> Any:
+            spans = current_spans.get()
+            if spans is None:
+                return await endpoint(*args, **kwargs)
+
+            started = time.perf_counter()
+            spans.add("dependencies", started - spans.mark)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                spans.mark = time.perf_counter()
+                spans.add("endpoint", spans.mark - started)
+
+        return timed_endpoint
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request: Any) -> Any:
+            spans = current_spans.get()
+            if spans is None:
+                return await handler(request)
+
+            spans.mark = time.perf_counter()
+            response = await handler(request)
+            spans.add("serialization", time.perf_counter() - spans.mark)
+            return response
+
+        return timed_handler
+
+
+class Histogram:
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * len(self.BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def exposition(self, name: str, labels: str) -> Iterator[str]:
+        cumulative = 0
+        for bound, count in zip(self.BUCKETS, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f"{name}_sum{{{labels}}} {self.sum}"
+        yield f"{name}_count{{{labels}}} {self.count}"
+
+
+class StackSampler(threading.Thread):
+    def __init__(self, thread_id: int, interval: float) -> None:
+        super().__init__(daemon=True, name="profiler")
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter[str] = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f"{code.co_qualname} ({code.co_filename}:{frame.f_lineno})"
+                )
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.join()
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class Profiler:
+    def __init__(self, keep: int) -> None:
+        self.histograms: dict[tuple[str, str], Histogram] = {}
+        self.profiles: deque[dict] = deque(maxlen=keep)
+        self._next_id = 0
+
+    def observe(self, route: str, name: str, seconds: float) -> None:
+        histogram = self.histograms.get((route, name))
+        if histogram is None:
+            histogram = self.histograms[route, name] = Histogram()
+        histogram.observe(seconds)
+
+    def store(self, route: str, duration: float, sampler: StackSampler) -> None:
+        self._next_id += 1
+        self.profiles.append(
+            {
+                "id": self._next_id,
+                "route": route,
+                "captured_at": time.time(),
+                "duration_ms": duration * 1000,
+                "samples": sum(sampler.stacks.values()),
+                "folded": sampler.folded(),
+            }
+        )
+
+    def get_profile(self, id: int) -> dict | None:
+        for profile in self.profiles:
+            if profile["id"] == id:
+                return profile
+        return None
+
+    def exposition(self) -> Iterator[str]:
+        yield "# TYPE formaptix_request_span_seconds histogram"
+        for (route, name), histogram in sorted(self.histograms.items()):
+            yield from histogram.exposition(
+                "formaptix_request_span_seconds", f'route="{route}",span="{name}"'
+            )
+
+
+# Records spans into histograms when enabled, and captures a flamegraph of
+# sampled requests to the chosen path, or of any request carrying the
+# profiling token. The sampler sees the whole event loop thread, so other
+# requests running concurrently show up in the stacks as well.
+class ProfilingMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        profiler: Profiler,
+        spans: bool,
+        route: str | None,
+        sample_rate: float,
+        token: str | None,
+        interval: float,
+    ) -> None:
+        self.app = app
+        self.profiler = profiler
+        self.spans = spans
+        self.route = route
+        self.sample_rate = sample_rate
+        self.token = token.encode("latin-1") if token else None
+        self.interval = interval
+
+    def _should_capture(self, scope: Scope) -> bool:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == b"x-profile" and hmac.compare_digest(value, self.token):
+                    return True
+        return scope["path"] == self.route and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = Spans() if self.spans else None
+        token = current_spans.set(spans)
+        sampler = None
+        if self._should_capture(scope):
+            sampler = StackSampler(threading.get_ident(), self.interval)
+            sampler.start()
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            duration = time.perf_counter() - started
+            current_spans.reset(token)
+            route = (
+                f'{scope["method"]} {getattr(scope.get("route"), "path", "unmatched")}'
+            )
+
+            if sampler is not None:
+                sampler.stop()
+                self.profiler.store(route, duration, sampler)
+
+            if spans is not None:
+                stats = current_request.get()
+                if stats is not None:
+                    spans["db"] = stats.db_time
+                    spans["pool_wait"] = stats.pool_wait
+                spans["total"] = duration
+                for name, seconds in spans.items():
+                    self.profiler.observe(route, name, seconds)
@@ -0,0 +1,122 @@
+import abc
+import asyncio
+import logging
+from typing import Any, Callable
+
+Callback = Callable[[str], Any]
+
+
+class Broker(abc.ABC):
+    # Delivered locally when messages may have been missed.
+    RESET = "broker:reset"
+
+    def __init__(self) -> None:
+        self._subscribers: dict[str, list[Callback]] = {}
+        # The event loop only keeps weak references to tasks.
+        self._tasks: set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    async def publish(self, channel: str, message: str) -> None:
+        pass
+
+    def subscribe(self, channel: str, callback: Callback) -> Callable[[], None]:
+        self._subscribers.setdefault(channel, []).append(callback)
+        return lambda: self._subscribers[channel].remove(callback)
+
+    def deliver(self, channel: str, message: str) -> None:
+        for callback in list(self._subscribers.get(channel, ())):
+            try:
+                result = callback(message)
+                if asyncio.iscoroutine(result):
+                    self._spawn(result, f"Subscriber of {channel} failed")
+            except Exception:
+                logging.exception("Subscriber of %s failed", channel)
+
+    def _spawn(self, coroutine: Any, failure: str) -> None:
+        def done(task: asyncio.Task) -> None:
+            self._tasks.discard(task)
+            if not task.cancelled() and task.exception() is not None:
+                logging.error("%s", failure, exc_info=task.exception())
+
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(done)
+
+
+class LocalBroker(Broker):
+    async def publish(self, channel: str, message: str) -> None:
+        self.deliver(channel, message)
+
+
+# Delivers through PostgreSQL LISTEN/NOTIFY, so every worker and instance on
+# the same database sees each message, the publisher included.
+class PostgresBroker(Broker):
+    RECONNECT_DELAY = 1.0  # seconds
+
+    def __init__(self, dsn: str) -> None:
+        super().__init__()
+        self.dsn = dsn
+        self._connection: Any = None
+        self._lock = asyncio.Lock()
+        self._stopping = False
+
+    async def start(self) -> None:
+        import asyncpg
+
+        self._stopping = False
+        self._connection = await asyncpg.connect(self.dsn)
+        self._connection.add_termination_listener(self._terminated)
+        for channel in self._subscribers:
+            await self._connection.add_listener(channel, self._notify)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def publish(self, channel: str, message: str) -> None:
+        # A connection runs one query at a time.
+        try:
+            async with self._lock:
+                await self._connection.execute(
+                    "SELECT pg_notify($1, $2)", channel, message
+                )
+        except Exception:
+            # Other workers miss this one, but this worker must not.
+            logging.exception("Failed to publish to %s", channel)
+            self.deliver(channel, message)
+
+    def subscribe(self, channel: str, callback: Callback) -> Callable[[], None]:
+        if self._connection is not None and channel not in self._subscribers:
+            self._spawn(
+                self._connection.add_listener(channel, self._notify),
+                f"Failed to listen on {channel}",
+            )
+        return super().subscribe(channel, callback)
+
+    def _notify(self, connection: Any, pid: int, channel: str, payload: str) -> None:
+        self.deliver(channel, payload)
+
+    def _terminated(self, connection: Any) -> None:
+        if not self._stopping:
+            self._spawn(self._reconnect(), "Failed to reconnect the broker")
+
+    async def _reconnect(self) -> None:
+        while not self._stopping:
+            logging.warning("Lost the broker connection, reconnecting")
+            try:
+                await self.start()
+            except Exception:
+                await asyncio.sleep(self.RECONNECT_DELAY)
+                continue
+            # Anything published meanwhile is lost, so subscribers have to
+            # drop whatever state those messages would have invalidated.
+            self.deliver(self.RESET, "")
+            return
@@ -0,0 +1,82 @@
+import functools
+import inspect
+from typing import Any, Callable
+
+import pydantic_core
+import starlette.responses
+from fastapi.datastructures import Default, DefaultPlaceholder
+from fastapi.dependencies.utils import get_typed_signature
+from fastapi.routing import APIRoute
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+
+class JSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # Models are serialized by pydantic-core straight to bytes, running
+        # their field serializers on the way.
+        return pydantic_core.to_json(content)
+
+
+# Streams while the request body is still being read. StreamingResponse
+# listens for a disconnect on receive() meanwhile, which would take the body's
+# messages from the endpoint; a disconnect surfaces from request.stream() as
+# ClientDisconnect instead.
+class UploadStreamingResponse(StreamingResponse):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+
+# Returning a response from the endpoint makes FastAPI skip its own
+# serialization: validating the value against the response model again,
+# jsonable_encoder and json.dumps. The response model is still documented and
+# background tasks are still attached, but headers, cookies and the status
+# code set on an injected `response: Response` would be dropped. Endpoints
+# taking one are therefore left to FastAPI, as are routes whose response class
+# is not the default JSON one. A Response injected into a dependency alone is
+# not detected.
+class JSONRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any) -> None:
+        response_class = kwargs.get("response_class", Default(JSONResponse))
+        if isinstance(response_class, DefaultPlaceholder):
+            response_class = response_class.value
+            if response_class is starlette.responses.JSONResponse:
+                response_class = JSONResponse
+        if response_class is JSONResponse and not self._takes_response(endpoint):
+            endpoint = self._wrap_json(endpoint, kwargs.get("status_code") or 200)
+        super().__init__(path, endpoint, **kwargs)
+
+    @staticmethod
+    def _takes_response(endpoint: Callable[..., Any]) -> bool:
+        return any(
+            isinstance(parameter.annotation, type)
+            and issubclass(parameter.annotation, Response)
+            for parameter in get_typed_signature(endpoint).parameters.values()
+        )
+
+    @staticmethod
+    def _wrap_json(
+        endpoint: Callable[..., Any], status_code: int
+    ) -> Callable[..., Any]:
+        def render(content: Any) -> Any:
+            if isinstance(content, Response):
+                return content
+            return JSONResponse(content, status_code)
+
+        if inspect.iscoroutinefunction(endpoint):
+
+            @functools.wraps(endpoint)
+            async def json_endpoint(*args: Any, **kwargs: Any) -> Any:
+                return render(await endpoint(*args, **kwargs))
+
+        else:
+
+            @functools.wraps(endpoint)
+            def json_endpoint(*args: Any, **kwargs: Any) -> Any:
+                return render(endpoint(*args, **kwargs))
+
+        return json_endpoint
@@ -1,76 +1,125 @@
+from typing import Sequence
+
+__all__ = ["validate_tin", "validate_snils", "validate_tins", "validate_snilses"]
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+TIN_10_WEIGHTS = (2, 4, 10, 3, 5, 9, 4, 6, 8)
+TIN_12_WEIGHTS_1 = (7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+TIN_12_WEIGHTS_2 = (3, 7, 2, 4, 10, 3, 5, 9, 4, 6, 8)
+SNILS_WEIGHTS = (9, 8, 7, 6, 5, 4, 3, 2, 1)
+
+# Below this size the pure Python loop beats building the digit matrix.
+BATCH_THRESHOLD = 64
+
+
+def _digits(value: str) -> list[int] | None:
+    # str.isdigit() also accepts non-ASCII digits such as "²", which int()
+    # then rejects.
+    if not (value.isascii() and value.isdigit()):
+        return None
+    return [ord(char) - 48 for char in value]
+
+
+def _checksum(digits: list[int], weights: tuple[int, ...]) -> int:
+    return sum(digit * weight for digit, weight in zip(digits, weights)) % 11 % 10
+
+
+def _snils_checksum(total: int) -> int:
+    if total > 101:
+        total %= 101
+    if total == 100 or total == 101:
+        total = 0
+    return total
+
+
 def validate_tin(value: str) -> bool:
     if len(value) != 10 and len(value) != 12:
         return False
 
-    value = list(map(int, value))
-
-    if len(value) == 10:
-        checksum = (
-            (
-                2 * value[0]
-                + 4 * value[1]
-                + 10 * value[2]
-                + 3 * value[3]
-                + 5 * value[4]
-                + 9 * value[5]
-                + 4 * value[6]
-                + 6 * value[7]
-                + 8 * value[8]
-            )
-            % 11
-            % 10
-        )
-        return value[9] == checksum
-    if len(value) == 12:
-        checksum1 = (
-            (
-                7 * value[0]
-                + 2 * value[1]
-                + 4 * value[2]
-                + 10 * value[3]
-                + 3 * value[4]
-                + 5 * value[5]
-                + 9 * value[6]
-                + 4 * value[7]
-                + 6 * value[8]
-                + 8 * value[9]
-            )
-            % 11
-            % 10
-        )
-        checksum2 = (
-            (
-                3 * value[0]
-                + 7 * value[1]
-                + 2 * value[2]
-                + 4 * value[3]
-                + 10 * value[4]
-                + 3 * value[5]
-                + 5 * value[6]
-                + 9 * value[7]
-                + 4 * value[8]
-                + 6 * value[9]
-                + 8 * value[10]
-            )
-            % 11
-            % 10
-        )
-        return value[10] == checksum1 and value[11] == checksum2
+    digits = _digits(value)
+    if digits is None:
+        return False
 
-    return False
+    if len(digits) == 10:
+        return digits[9] == _checksum(digits, TIN_10_WEIGHTS)
+
+    first = _checksum(digits, TIN_12_WEIGHTS_1)
+    second = _checksum(digits, TIN_12_WEIGHTS_2)
+    return digits[10] == first and digits[11] == second
 
 
 def validate_snils(value: str) -> bool:
-    if len(value) == 11:
-        checksum = 0
-        for i in range(9):
-            checksum += int(value[i]) * (9 - i)
+    if len(value) != 11:
+        return False
+
+    digits = _digits(value)
+    if digits is None:
+        return False
+
+    total = sum(digit * weight for digit, weight in zip(digits, SNILS_WEIGHTS))
+    return _snils_checksum(total) == digits[9] * 10 + digits[10]
+
+
+def _digit_matrix(
+    values: Sequence[str], length: int
+) -> tuple[list[int], "numpy.ndarray"]:
+    # Rows of the given length, as a matrix of digits. Non-digit characters
+    # come out of range and are rejected by the caller.
+    rows = []
+    encoded = []
+    for i, value in enumerate(values):
+        if len(value) == length and value.isascii():
+            rows.append(i)
+            encoded.append(value.encode("ascii"))
+
+    matrix = numpy.frombuffer(b"".join(encoded), dtype=numpy.uint8)
+    matrix = matrix.reshape(len(rows), length).astype(numpy.int64) - 48
+    return rows, matrix
+
+
+def _tin_checksum(matrix: "numpy.ndarray", weights: tuple[int, ...]) -> "numpy.ndarray":
+    return matrix[:, : len(weights)] @ numpy.array(weights) % 11 % 10
+
+
+def validate_tins(values: Sequence[str]) -> list[bool]:
+    if numpy is None or len(values) < BATCH_THRESHOLD:
+        return [validate_tin(value) for value in values]
+
+    result = numpy.zeros(len(values), dtype=bool)
+
+    rows, matrix = _digit_matrix(values, 10)
+    if rows:
+        digits = ((matrix >= 0) & (matrix <= 9)).all(axis=1)
+        result[rows] = digits & (matrix[:, 9] == _tin_checksum(matrix, TIN_10_WEIGHTS))
+
+    rows, matrix = _digit_matrix(values, 12)
+    if rows:
+        digits = ((matrix >= 0) & (matrix <= 9)).all(axis=1)
+        result[rows] = (
+            digits
+            & (matrix[:, 10] == _tin_checksum(matrix, TIN_12_WEIGHTS_1))
+            & (matrix[:, 11] == _tin_checksum(matrix, TIN_12_WEIGHTS_2))
+        )
+
+    return result.tolist()
+
+
+def validate_snilses(values: Sequence[str]) -> list[bool]:
+    if numpy is None or len(values) < BATCH_THRESHOLD:
+        return [validate_snils(value) for value in values]
 
-        if checksum > 101:
-            checksum = checksum % 101
-        if checksum == 100 or checksum == 101:
-            checksum = 0
+    result = numpy.zeros(len(values), dtype=bool)
 
-        return checksum == int(value[9:])
+    rows, matrix = _digit_matrix(values, 11)
+    if rows:
+        digits = ((matrix >= 0) & (matrix <= 9)).all(axis=1)
+        total = matrix[:, :9] @ numpy.array(SNILS_WEIGHTS)
+        total = numpy.where(total > 101, total % 101, total)
+        total = numpy.where(total >= 100, 0, total)
+        result[rows] = digits & (total == matrix[:, 9] * 10 + matrix[:, 10])
 
-    return False
+    return result.tolist()